@@ -0,0 +1,25 @@
+# Standard libs:
+from jinja2 import Environment
+
+# Django libs:
+from django.templatetags.static import static
+from django.urls import reverse
+
+
+# Functions:
+def url(name, *args):
+    """Equivalent of Django's {% url %} tag."""
+
+    return reverse(name, args=args)
+
+
+def environment(**options):
+    """Return Jinja2 environment of the templates in projects/jinja2/."""
+
+    env = Environment(**options)
+    env.globals.update({
+        "static": static,
+        "url": url,
+    })
+
+    return env
@@ -0,0 +1,227 @@
+# Standard libs:
+import os
+import json
+import time
+import atexit
+import threading
+
+# Django libs:
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, Http404
+
+
+# Constants:
+# Histograms recorded for each request, as name: (help, bucket upper bounds):
+HISTOGRAMS = {
+    "webprojects_request_duration_seconds": (
+        "Wall time to serve a request, by URL name.",
+        [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    ),
+    "webprojects_request_queries": (
+        "SQL queries run to serve a request, by URL name.",
+        [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000],
+    ),
+    "webprojects_request_sql_duration_seconds": (
+        "Time spent in SQL queries to serve a request, by URL name.",
+        [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5],
+    ),
+}
+UNRESOLVED = "<unresolved>"  # label for requests that match no URL (e.g. 404s)
+FLUSH_INTERVAL = 5  # seconds between writes of a worker's metrics to its file
+
+
+# Functions:
+def escape_label(value):
+    """Return 'value' escaped as a Prometheus label value."""
+
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def merge(total, data):
+    """Add histograms in 'data' (as in MetricsStore.data) to those in 'total'."""
+
+    for name, views in data.items():
+        if name not in HISTOGRAMS:  # metric dropped since file was written
+            continue
+        for view, histogram in views.items():
+            into = total.setdefault(name, {}).setdefault(view, new_histogram(name))
+            into["buckets"] = [a + b for a, b in zip(into["buckets"], histogram["buckets"])]
+            into["sum"] += histogram["sum"]
+            into["count"] += histogram["count"]
+
+
+def new_histogram(name):
+    """Return empty histogram for metric 'name'. Buckets are not cumulative:
+    the last one counts observations above all bounds.
+    """
+    bounds = HISTOGRAMS[name][1]
+
+    return {"buckets": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0}
+
+
+def render(data):
+    """Return histograms in 'data' in the Prometheus text exposition format."""
+
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines.append("# HELP {} {}".format(name, help_text))
+        lines.append("# TYPE {} histogram".format(name))
+        for view, histogram in sorted(data.get(name, {}).items()):
+            label = 'view="{}"'.format(escape_label(view))
+            cumulative = 0
+            for bound, n in zip(bounds + ["+Inf"], histogram["buckets"]):
+                cumulative += n
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, label, bound, cumulative))
+            lines.append("{}_sum{{{}}} {}".format(name, label, repr(histogram["sum"])))
+            lines.append("{}_count{{{}}} {}".format(name, label, histogram["count"]))
+
+    return "\n".join(lines) + "\n"
+
+
+def get_store():
+    """Return the MetricsStore of this process for settings.METRICS_DIR, or
+    None if metrics are disabled.
+    """
+    directory = settings.METRICS_DIR
+    if not directory:
+        return None
+
+    with MetricsStore.stores_lock:
+        if directory not in MetricsStore.stores:
+            MetricsStore.stores[directory] = MetricsStore(directory)
+
+        return MetricsStore.stores[directory]
+
+
+def metrics(request):
+    """View with the metrics of all workers, in Prometheus text format."""
+
+    store = get_store()
+    if store is None:
+        raise Http404("Metrics are disabled")
+
+    store.flush()
+
+    return HttpResponse(render(store.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Classes:
+class MetricsStore(object):
+    """Histograms of one process, saved to its own JSON file in 'directory' so
+    that the metrics of all (gunicorn) workers can be added up. Files of dead
+    workers are kept, so that totals never decrease.
+    """
+    stores = {}  # one per directory
+    stores_lock = threading.Lock()
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.fn = os.path.join(directory, "metrics_{}.json".format(os.getpid()))
+        self.data = {}
+        self.dirty = False
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+        # Keep what a previous process with our same PID recorded:
+        try:
+            with open(self.fn) as f:
+                merge(self.data, json.load(f))
+        except (OSError, ValueError):
+            pass
+
+        atexit.register(self.flush)
+
+    def observe(self, view, values):
+        """Record 'values' (dict of metric name: value) of a request to 'view'."""
+
+        with self.lock:
+            for name, value in values.items():
+                histogram = self.data.setdefault(name, {}).setdefault(view, new_histogram(name))
+                i = 0
+                for bound in HISTOGRAMS[name][1]:
+                    if value <= bound:
+                        break
+                    i += 1
+                histogram["buckets"][i] += 1
+                histogram["sum"] += value
+                histogram["count"] += 1
+            self.dirty = True
+
+        if time.monotonic() - self.flushed > FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write our metrics to our file, atomically."""
+
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp = "{}.tmp".format(self.fn)
+            with open(tmp, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.fn)
+            self.dirty = False
+            self.flushed = time.monotonic()
+
+    def collect(self):
+        """Return the metrics of all processes, added up."""
+
+        total = {}
+        directory = os.path.dirname(self.fn)
+        for fn in sorted(os.listdir(directory)):
+            if not (fn.startswith("metrics_") and fn.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(directory, fn)) as f:
+                    merge(total, json.load(f))
+            except (OSError, ValueError):  # file vanished or being replaced
+                continue
+
+        return total
+
+
+class QueryTimer(object):
+    """Database execute wrapper that counts queries and adds up their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+class MetricsMiddleware(object):
+    """Record wall time, SQL query count and SQL time of each request, by
+    URL name (e.g. "projects:index").
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        store = get_store()
+        if store is None:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else UNRESOLVED
+        if view != "metrics":  # don't let scrapes pollute metrics
+            store.observe(view, {
+                "webprojects_request_duration_seconds": duration,
+                "webprojects_request_queries": timer.count,
+                "webprojects_request_sql_duration_seconds": timer.time,
+            })
+
+        return response
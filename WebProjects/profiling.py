@@ -0,0 +1,157 @@
+# Standard libs:
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+from datetime import datetime
+
+# Django libs:
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+
+# Constants:
+TOP_FUNCTIONS = 40  # functions listed in profile reports
+# Template.render() of the template backends, to time template rendering:
+TEMPLATE_RENDERS = [
+    ("django/template/backends/django.py", "render"),
+    ("django/template/backends/jinja2.py", "render"),
+]
+
+
+# Functions:
+def is_requested(request):
+    """Return the profiling switch of 'request': the value of the 'profile' GET
+    parameter or X-Profile header ("" if given without value), or None.
+    """
+    if "profile" in request.GET:
+        return request.GET["profile"]
+
+    return request.META.get("HTTP_X_PROFILE")
+
+
+def template_time(stats):
+    """Return time spent rendering templates, out of pstats.Stats 'stats'."""
+
+    total = 0.0
+    for (filename, lineno, function), (cc, nc, tt, ct, callers) in stats.stats.items():
+        for template_filename, template_function in TEMPLATE_RENDERS:
+            if filename.endswith(template_filename) and function == template_function:
+                total += ct
+
+    return total
+
+
+def mk_report(request, summary, stats):
+    """Return profile 'summary' (as returned by Profile.summary()) and top
+    functions in 'stats' as text.
+    """
+    lines = [
+        "Profile of {} {} ({})".format(request.method, request.get_full_path(), summary["view"]),
+        "",
+        "Total:     {:10.1f} ms".format(summary["total"]*1000),
+        "Python:    {:10.1f} ms".format(summary["python"]*1000),
+        "SQL:       {:10.1f} ms in {} queries".format(summary["sql"]*1000, len(summary["queries"])),
+        "Templates: {:10.1f} ms (including SQL run while rendering)".format(summary["templates"]*1000),
+        "",
+        "SQL statements:",
+    ]
+    for query in summary["queries"]:
+        lines.append("{:10.2f} ms  {}".format(query["time"]*1000, query["sql"]))
+
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    lines.extend(["", "Top functions by cumulative time:", out.getvalue()])
+
+    return "\n".join(lines)
+
+
+# Classes:
+class Profile(object):
+    """cProfile profile of a request, plus its SQL statements, collected as a
+    database execute wrapper.
+    """
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({"sql": sql, "time": time.perf_counter() - start, "many": many})
+
+    def run(self, function, *args):
+        """Run 'function' with 'args' under the profiler, and return its output.
+        Several runs add up.
+        """
+        start = time.perf_counter()
+        with connection.execute_wrapper(self):
+            self.profiler.enable()
+            try:
+                return function(*args)
+            finally:
+                self.profiler.disable()
+                self.total += time.perf_counter() - start
+
+    def summary(self, view_name):
+        """Return dict with time breakdown (seconds) and SQL statements."""
+
+        sql = sum([q["time"] for q in self.queries])
+
+        return {
+            "view": view_name,
+            "total": self.total,
+            "sql": sql,
+            "python": self.total - sql,
+            "templates": template_time(pstats.Stats(self.profiler)),
+            "queries": self.queries,
+        }
+
+
+class ProfilingMiddleware(object):
+    """Profile requests of staff users carrying a 'profile' GET parameter or
+    an X-Profile header. By default the profile report replaces the response.
+    With value "store", the response is returned as usual, and the profile is
+    saved to settings.PROFILE_DIR, as a pstats file (e.g. for snakeviz) plus
+    a JSON summary. Other requests only pay for checking the switch.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        switch = is_requested(request)
+        if switch is None or not request.user.is_staff:
+            return self.get_response(request)
+
+        # Do the actual work, not serving it from cache or as "304 Not Modified":
+        request.profiling = True  # see projects.cache.cache_view()
+        for header in ["HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE"]:
+            request.META.pop(header, None)
+
+        profile = Profile()
+        response = profile.run(self.get_response, request)
+        if response.streaming:
+            response.streaming_content = [profile.run(b"".join, response.streaming_content)]
+
+        match = getattr(request, "resolver_match", None)
+        summary = profile.summary(match.view_name if match else "")
+        stats = pstats.Stats(profile.profiler)
+
+        if switch == "store":
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            name = "{:%Y%m%d%H%M%S%f}_{}".format(datetime.now(), summary["view"].replace(":", "_") or "unresolved")
+            stats.dump_stats(os.path.join(settings.PROFILE_DIR, name + ".prof"))
+            with open(os.path.join(settings.PROFILE_DIR, name + ".json"), "w") as f:
+                json.dump(dict(summary, path=request.get_full_path()), f, indent=2)
+            response["X-Profile"] = name
+
+            return response
+
+        return HttpResponse(mk_report(request, summary, stats), content_type="text/plain; charset=utf-8")
@@ -6,8 +6,13 @@ import os
 import json
 import importlib
 
+# Our libs:
+from WebProjects import database
+
 # Read first config in list of configs to try:
 try_confs = []
+if 'WEBPROJECTS_CONF' in os.environ:
+    try_confs.append(os.environ['WEBPROJECTS_CONF'])
 try_confs.append("/etc/WebProjects/WebProjects.json")
 try_confs.append("conf/WebProjects.json")
 
@@ -25,17 +30,45 @@ ADMINS = [
     ('Iñaki Silanes', 'isilanes@gmail.com'),
 ]
 MANAGERS = ADMINS
-DATABASES = {
+# Database given by DATABASE_URL (environment or WebProjects.json), or else
+# the SQLite file in DBFILE (see WebProjects/database.py):
+DATABASES = database.databases_from_conf(J)
+
+# Pragmas applied to every new SQLite connection (see WebProjects/database.py):
+SQLITE_PRAGMAS = J.get('SQLITE_PRAGMAS', {})
+
+# Cache shared by all (gunicorn) workers, to cache views. Cached views are
+# invalidated whenever data change, or after VIEW_CACHE_TIMEOUT seconds:
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3', # Add 'postgresql_psycopg2', 'mysql', 'sqlite3' or 'oracle'.
-        # DB name or path to database file if using sqlite3:
-        'NAME': J['DBFILE'],
-        'USER': '',                      # Not used with sqlite3.
-        'PASSWORD': '',                  # Not used with sqlite3.
-        'HOST': '',                      # Set to empty string for localhost. Not used with sqlite3.
-        'PORT': '',                      # Set to empty string for default. Not used with sqlite3.
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': J.get('CACHE_DIR', '/var/tmp/WebProjects_cache'),
     }
 }
+VIEW_CACHE_TIMEOUT = J.get('VIEW_CACHE_TIMEOUT', 300)
+
+# Template engine of the long list pages: "django", or "jinja2" to render them
+# from precomputed rows with the templates in projects/jinja2/ (see projects/rows.py):
+LIST_TEMPLATE_ENGINE = J.get('LIST_TEMPLATE_ENGINE', 'django')
+
+# Max amount of Projects per page of the project lists (see projects/pagination.py):
+PROJECT_PAGE_SIZE = J.get('PROJECT_PAGE_SIZE', 500)
+
+# Directory where each (gunicorn) worker saves its request metrics, served
+# at /metrics. Set to null to disable metrics:
+METRICS_DIR = J.get('METRICS_DIR', '/var/tmp/WebProjects_metrics')
+
+# Views running more queries than their budget (see projects/budget.py) log a
+# warning, or fail if QUERY_BUDGET_STRICT (always, in tests):
+QUERY_BUDGET_STRICT = J.get('QUERY_BUDGET_STRICT', False)
+
+# Directory where profiles of requests are stored (see WebProjects/profiling.py):
+PROFILE_DIR = J.get('PROFILE_DIR', '/var/tmp/WebProjects_profiles')
+
+# Queries taking longer than SLOW_QUERY_THRESHOLD seconds (null to disable) are
+# logged to SLOW_QUERY_LOG, and summarized at /slow_queries (see WebProjects/slowlog.py):
+SLOW_QUERY_THRESHOLD = J.get('SLOW_QUERY_THRESHOLD', 0.1)
+SLOW_QUERY_LOG = J.get('SLOW_QUERY_LOG', '/var/tmp/WebProjects_slow_queries.log')
 
 # Hosts/domain names that are valid for this site; required if DEBUG is False
 # See https://docs.djangoproject.com/en/1.4/ref/settings/#allowed-hosts
@@ -99,12 +132,15 @@ STATICFILES_FINDERS = [
 # Make this unique, and don't share it with anybody.
 SECRET_KEY = J['SECRET_KEY']
 
-MIDDLEWARE_CLASSES = [
+MIDDLEWARE = [
+    'WebProjects.metrics.MetricsMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'WebProjects.profiling.ProfilingMiddleware',
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -112,6 +148,9 @@ MIDDLEWARE_CLASSES = [
 
 ROOT_URLCONF = 'WebProjects.urls'
 
+# Runs the tests with the settings in WebProjects/testrunner.py:
+TEST_RUNNER = 'WebProjects.testrunner.TestRunner'
+
 # Python dotted path to the WSGI application used by Django's runserver.
 WSGI_APPLICATION = 'WebProjects.wsgi.application'
 
@@ -148,12 +187,30 @@ LOGGING = {
             '()': 'django.utils.log.RequireDebugFalse'
         }
     },
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
+        },
+    },
     'handlers': {
         'mail_admins': {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
-        }
+        },
+        'console': {
+            'level': 'WARNING',
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            # Shared by all (gunicorn) workers, so rotated by logrotate (see
+            # conf/WebProjects.logrotate), which this handler notices:
+            'level': 'WARNING',
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'delay': True,
+            'formatter': 'message',
+        },
     },
     'loggers': {
         'django.request': {
@@ -161,6 +218,16 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'projects': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': True,
+        },
+        'projects.slow_query': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     }
 }
 
@@ -176,6 +243,7 @@ TEMPLATES = [
                 'context_processors': [
                     'django.contrib.auth.context_processors.auth',
                     'django.template.context_processors.debug',
+                    'django.template.context_processors.request',
                     'django.template.context_processors.i18n',
                     'django.template.context_processors.media',
                     'django.template.context_processors.static',
@@ -184,4 +252,15 @@ TEMPLATES = [
                 ],
             },
         },
+        {
+            # Alternative engine for the long list pages (see LIST_TEMPLATE_ENGINE):
+            "BACKEND": "django.template.backends.jinja2.Jinja2",
+            "DIRS": [],
+            "APP_DIRS": True,
+            "OPTIONS": {
+                "environment": "WebProjects.jinja2.environment",
+                "trim_blocks": True,
+                "lstrip_blocks": True,
+            },
+        },
 ]
@@ -0,0 +1,167 @@
+# Standard libs:
+import os
+import re
+import sys
+import json
+import time
+import logging
+from datetime import datetime
+
+# Django libs:
+from django.conf import settings
+from django.db import DatabaseError
+
+
+# Constants:
+logger = logging.getLogger("projects.slow_query")
+CALLER_MODULES = ("projects.views", "projects.management.commands.")  # prefixes of modules of callers
+METHOD_MODULES = ("projects.models", "projects.accounting")  # modules of model methods
+
+
+# Functions:
+def normalize_sql(sql):
+    """Return 'sql' with literals and parameters replaced by '?', lists of
+    parameters (as in "IN (%s, %s, %s)") collapsed, and whitespace collapsed,
+    so that all runs of a statement look the same.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(...)", sql)
+
+    return " ".join(sql.split())
+
+
+def find_callers():
+    """Return the caller (view or management command) and model method that
+    the current query comes from, out of the call stack, e.g.:
+    ("projects.views.ip_detail", "Project.get_disk_usage")
+    """
+    caller, method = None, None
+    frame = sys._getframe(1)
+    while frame is not None and caller is None:
+        module = frame.f_globals.get("__name__", "")
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)
+        if method is None and module in METHOD_MODULES:
+            method = name
+        if module.startswith(CALLER_MODULES):
+            caller = "{}.{}".format(module, name)
+        frame = frame.f_back
+
+    return caller, method
+
+
+def explain(connection, sql, params):
+    """Return the query plan of 'sql' with 'params' as a list of lines, or
+    the error of trying to get it. The EXPLAIN does not go through execute
+    wrappers, so that it is not counted as a query of the app (see metrics
+    and query budgets).
+    """
+    wrappers = connection.execute_wrappers
+    connection.execute_wrappers = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("{} {}".format(connection.ops.explain_query_prefix(), sql), params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        return ["EXPLAIN failed: {}".format(e)]
+    finally:
+        connection.execute_wrappers = wrappers
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Database execute wrapper that logs statements slower than
+    settings.SLOW_QUERY_THRESHOLD seconds (if not None) as JSON entries in
+    the "projects.slow_query" logger, with normalized SQL, caller, model
+    method, duration and query plan.
+    """
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is not None and duration >= threshold:
+            caller, method = find_callers()
+            connection = context["connection"]
+            is_select = sql.lstrip().upper().startswith("SELECT")
+            entry = {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "duration": round(duration, 6),
+                "sql": normalize_sql(sql),
+                "caller": caller,
+                "method": method,
+                "plan": explain(connection, sql, params) if is_select and not many else [],
+            }
+            logger.warning(json.dumps(entry))
+
+
+def install(sender, connection, **kwargs):
+    """connection_created signal receiver to log slow queries of 'connection'."""
+
+    # First in list, as execute_wrapper() blocks open at this point pop the last one:
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_query)
+
+
+def read_entries(path):
+    """Yield the entries logged to 'path', and its rotated backups, oldest first."""
+
+    paths = [path]
+    n = 1
+    while os.path.exists("{}.{}".format(path, n)):
+        paths.insert(0, "{}.{}".format(path, n))
+        n += 1
+
+    for fn in paths:
+        try:
+            with open(fn) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:  # a line being written, or foreign
+                        continue
+        except OSError:
+            continue
+
+
+def get_summary():
+    """Return summary (see summarize()) of all entries in settings.SLOW_QUERY_LOG."""
+
+    return summarize(read_entries(settings.SLOW_QUERY_LOG))
+
+
+def summarize(entries):
+    """Return list of dicts aggregating 'entries' by normalized statement,
+    with count, total, mean and max duration, callers and methods, and the
+    plan of the slowest run, sorted by total duration.
+    """
+    summary_of = {}
+    for entry in entries:
+        s = summary_of.setdefault(entry["sql"], {
+            "sql": entry["sql"],
+            "count": 0,
+            "total": 0.0,
+            "max": 0.0,
+            "callers": set(),
+            "methods": set(),
+            "plan": [],
+            "last": None,
+        })
+        s["count"] += 1
+        s["total"] += entry["duration"]
+        if entry["duration"] >= s["max"]:
+            s["max"] = entry["duration"]
+            s["plan"] = entry["plan"]
+        s["callers"].add(entry["caller"] or "-")
+        s["methods"].add(entry["method"] or "-")
+        s["last"] = entry["time"]
+
+    summaries = sorted(summary_of.values(), key=lambda s: -s["total"])
+    for s in summaries:
+        s["mean"] = s["total"]/s["count"]
+        s["callers"] = sorted(s["callers"])
+        s["methods"] = sorted(s["methods"])
+
+    return summaries
@@ -0,0 +1,28 @@
+# Django libs:
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Constants:
+# Settings to test with: views cached in memory, no metrics, no query logging,
+# and query budgets enforced (see projects/budget.py):
+TEST_SETTINGS = {
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    "METRICS_DIR": None,
+    "QUERY_BUDGET_STRICT": True,
+    "SLOW_QUERY_THRESHOLD": None,
+}
+
+
+# Classes:
+class TestRunner(DiscoverRunner):
+    """Test runner of "manage.py test", running the tests with TEST_SETTINGS."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -2,10 +2,16 @@
 from django.contrib import admin
 from django.urls import path, include
 
+# Our libs:
+from WebProjects import metrics
+
 urlpatterns = [
     # Admin URL:
     path('admin/', admin.site.urls),
 
+    # Prometheus metrics:
+    path('metrics', metrics.metrics, name="metrics"),
+
     # Default URL:
     path('', include('projects.urls', namespace="projects")),
 ]
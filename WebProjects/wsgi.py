@@ -22,13 +22,12 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "WebProjects.settings")
 
 # Django stuff:
 from django.core.wsgi import get_wsgi_application
-from whitenoise.django import DjangoWhiteNoise
 
 # This application object is used by any WSGI server configured to use this
 # file. This includes Django's development server, if the WSGI_APPLICATION
 # setting points here.
+# Static files are served by WhiteNoiseMiddleware (see settings.MIDDLEWARE).
 application = get_wsgi_application()
-application = DjangoWhiteNoise(application)
 
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
@@ -1,5 +1,6 @@
 #!/bin/bash
 
+python3 manage.py migrate --noinput  # Bring database schema up to date
 python3 manage.py collectstatic --noinput  # Collect static files
 
 # Prepare log files and start outputting logs to stdout:
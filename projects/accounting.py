@@ -0,0 +1,180 @@
+# Standard libs:
+import numpy as np
+
+# Django libs:
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+# Our libs:
+from projects.models import Project, Period, LedgerMonth, LedgerEntry, DISK_PRICE, PENALTY_EXPIRED, BONUS_BUFFER
+
+
+# Constants:
+FACTOR_OF_STATUS = {
+    "expired": PENALTY_EXPIRED,
+    "frozen": BONUS_BUFFER,
+}
+EXPORT_FIELDS = ["month", "pk", "id", "ip", "name", "account", "disk_cost", "gbd"]
+
+
+# Functions:
+def month_edges(from_year, from_month, to_year, to_month):
+    """Return list of datetimes of the first day of each month from
+    (from_year, from_month) to (to_year, to_month), both included, plus
+    the first day of the month after the last one. That is, the N+1 edges
+    of N months.
+    """
+    tz = timezone.get_default_timezone()
+
+    edges = []
+    year, month = from_year, from_month
+    while (year, month) <= (to_year, to_month):
+        edges.append(timezone.datetime(year=year, month=month, day=1, tzinfo=tz))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    edges.append(timezone.datetime(year=year, month=month, day=1, tzinfo=tz))
+
+    return edges
+
+
+def disk_cost_matrix(edges, overlapping=False):
+    """Compute disk usage and cost of every Project, for each window between
+    consecutive datetimes in 'edges', in one pass over all the Periods
+    overlapping [edges[0], edges[-1]).
+
+    Return pks, cost, gbd, where:
+    pks: array with the pk of each Project (P elements).
+    cost: P x N array with the cost of each Project in each of the N windows,
+          with the same pricing as Period.disk_cost().
+    gbd: P x N array with the GB*day used by each Project in each window.
+
+    If 'overlapping' is True, also return a P x N boolean array telling
+    whether each Project has Periods overlapping each window (even if with
+    zero cost, e.g. with zero quota).
+    """
+    periods = Period.objects.filter(end__gt=edges[0], start__lt=edges[-1])
+    rows = list(periods.values_list("proj_id", "start", "end", "quota", "status"))
+    if not rows:
+        empty = np.zeros((0, len(edges) - 1))
+        result = np.zeros(0, dtype=int), empty, empty
+
+        return result + (empty.astype(bool),) if overlapping else result
+
+    proj_id, start, end, quota, status = zip(*rows)
+    start = np.array([t.timestamp() for t in start])
+    end = np.array([t.timestamp() for t in end])
+    quota = np.array(quota, dtype=float)
+    factor = np.array([FACTOR_OF_STATUS.get(s, 1.0) for s in status])
+    t = np.array([e.timestamp() for e in edges])
+
+    # Overlap (in days) of each Period (rows) with each window (columns):
+    overlap = np.minimum(end[:, None], t[None, 1:]) - np.maximum(start[:, None], t[None, :-1])
+    overlap = np.clip(overlap, 0, None)/86400.
+
+    # Accumulate Periods into their Projects:
+    pks, index = np.unique(proj_id, return_inverse=True)
+    gbd = np.zeros((len(pks), len(edges) - 1))
+    cost = np.zeros((len(pks), len(edges) - 1))
+    np.add.at(gbd, index, overlap*quota[:, None])
+    np.add.at(cost, index, overlap*(DISK_PRICE*quota*factor/1000.)[:, None])  # GB -> TB
+
+    if overlapping:
+        overlaps = np.zeros((len(pks), len(edges) - 1), dtype=bool)
+        np.logical_or.at(overlaps, index, overlap > 0)
+
+        return pks, cost, gbd, overlaps
+
+    return pks, cost, gbd
+
+
+def closed_months(now=None):
+    """Return list of (year, month) tuples of all the months from the first
+    one with a Period, up to the one before the current one.
+    """
+    first = Period.objects.aggregate(t=Min("start"))["t"]
+    if first is None:
+        return []
+
+    first = timezone.localtime(first)
+    now = timezone.localtime(now or timezone.now())
+
+    months = []
+    year, month = first.year, first.month
+    while (year, month) < (now.year, now.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return months
+
+
+def update_ledger(now=None, full=False):
+    """Store in the ledger the accounting of all months closed by 'now' (by
+    default, the current time) not in it yet, plus that of the months touched
+    by Periods modified since last run (or of all closed months, if 'full'
+    is True). Return the (year, month) tuples of recomputed months.
+    """
+    run_time = timezone.now()
+    closed = closed_months(now)
+
+    if full:
+        months = set(closed)
+    else:
+        stored = set([(d.year, d.month) for d in LedgerMonth.objects.values_list("month", flat=True)])
+        months = set(closed) - stored
+
+        last_run = LedgerMonth.objects.aggregate(t=Max("computed"))["t"]
+        if last_run is not None:
+            for start, end in Period.objects.filter(modified__gt=last_run).values_list("start", "end"):
+                start, end = timezone.localtime(start), timezone.localtime(end)
+                months.update([m for m in closed if (start.year, start.month) <= m <= (end.year, end.month)])
+
+    if not months:
+        return []
+
+    months = sorted(months)
+    edges = month_edges(*months[0], *months[-1])
+    pks, cost, gbd, overlaps = disk_cost_matrix(edges, overlapping=True)
+
+    with transaction.atomic():
+        LedgerMonth.objects.filter(month__in=[e.date() for e in edges[:-1] if (e.year, e.month) in months]).delete()
+        entries = []
+        for i, edge in enumerate(edges[:-1]):
+            if (edge.year, edge.month) not in months:
+                continue
+
+            ledger_month = LedgerMonth.objects.create(month=edge.date(), computed=run_time)
+            # Every Project with Periods in the month, as disk_accounting computes it live:
+            for j in np.nonzero(overlaps[:, i])[0]:
+                entries.append(LedgerEntry(month=ledger_month, proj_id=int(pks[j]),
+                                           disk_cost=cost[j, i], gbd=gbd[j, i]))
+        LedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+    return months
+
+
+def iter_accounting(edges, chunk_size=2000):
+    """Yield a dict (with EXPORT_FIELDS as keys) per Project and month between
+    consecutive datetimes in 'edges', month by month. Closed months in the
+    ledger are read from it with a server-side cursor, the rest are computed.
+    Whether a month is in the ledger is only known when it is read, as it may
+    be invalidated (see LedgerMonth.invalidate()) while streaming: a closed
+    month with no entries is computed too.
+    """
+    now = timezone.now()
+    fields = ["proj_id", "proj__proj_id", "proj__ip__ip_name", "proj__name", "proj__user", "disk_cost", "gbd"]
+
+    for start, end in zip(edges[:-1], edges[1:]):
+        month = start.strftime("%Y-%m")
+        stored = False
+        if end <= now:
+            entries = LedgerEntry.objects.filter(month__month=start.date()).order_by("proj_id")
+            for row in entries.values_list(*fields).iterator(chunk_size=chunk_size):
+                stored = True
+                yield dict(zip(EXPORT_FIELDS, (month,) + row))
+        if not stored:
+            pks, cost, gbd = disk_cost_matrix([start, end])
+            projects = Project.objects.filter(pk__in=pks.tolist()).select_related("ip")
+            projects = projects.only("proj_id", "name", "user", "ip__ip_name").in_bulk()
+            for pk, c, g in zip(pks.tolist(), cost[:, 0].tolist(), gbd[:, 0].tolist()):
+                p = projects[pk]
+                yield dict(zip(EXPORT_FIELDS, [month, pk, p.proj_id, p.ip.ip_name, p.name, p.user, c, g]))
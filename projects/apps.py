@@ -1,7 +1,15 @@
 # Django libs:
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+# Our libs:
+from WebProjects import database, slowlog
 
 
 # Classes:
 class ProjectsConfig(AppConfig):
     name = 'projects'
+
+    def ready(self):
+        connection_created.connect(database.apply_sqlite_pragmas)
+        connection_created.connect(slowlog.install)
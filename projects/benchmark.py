@@ -0,0 +1,188 @@
+# Standard libs:
+import time
+import statistics
+from datetime import timedelta
+
+# Django libs:
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+# Our libs:
+from WebProjects.metrics import QueryTimer
+from projects import accounting, synthetic
+from projects.models import IP, Project
+
+
+# Constants:
+SIZES = [100, 1000, 10000]  # default dataset sizes, in amount of Projects
+REPEAT = 5  # timed runs of each case (after a first one counting queries)
+MODEL_SAMPLE = 200  # amount of Projects whose methods are timed
+UNPAGINATED = 10**9  # page size to render whole project lists with
+TOLERANCE = 1.25  # max ratio of min time to baseline before reporting a regression
+
+# Settings to benchmark with: no view caching, no metrics, no query logging:
+BENCHMARK_SETTINGS = {
+    "DEBUG": False,
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    "METRICS_DIR": None,
+}
+
+
+# Functions:
+def dataset_size(n_projects):
+    """Return amount of IPs, Projects and Reservations of the dataset of
+    size 'n_projects'.
+    """
+    return {
+        "n_ips": max(1, n_projects//10),
+        "n_projects": n_projects,
+        "n_reservations": max(10, n_projects//20),
+    }
+
+
+def get_cases(now):
+    """Return list of (name, function) of the cases to time, for the data
+    currently in database.
+    """
+    client = Client()
+
+    def view(name, *args, **params):
+        url = reverse(name, args=args)
+
+        def get():
+            response = client.get(url, params)
+            if response.status_code != 200:
+                raise RuntimeError("GET {} returned {}".format(url, response.status_code))
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        return get
+
+    def jinja2(get):
+        """Same case, with list pages rendered by Jinja2 (see projects/rows.py)."""
+
+        def call():
+            with override_settings(LIST_TEMPLATE_ENGINE="jinja2"):
+                get()
+
+        return call
+
+    def unpaginated(get):
+        """Same case, with the whole list in a single page (see projects/pagination.py)."""
+
+        def call():
+            with override_settings(PROJECT_PAGE_SIZE=UNPAGINATED):
+                get()
+
+        return call
+
+    def method(name):
+        def call():
+            projects = Project.objects.order_by("pk").prefetch_related("period_set")[:MODEL_SAMPLE]
+            for project in projects:
+                getattr(project, name)()
+
+        return call
+
+    project = Project.objects.order_by("pk").first()
+    ip = IP.objects.order_by("pk").first()
+    this_month = timezone.localtime(now)
+    last_month = this_month.replace(day=1) - timedelta(days=1)
+    year_ago = this_month - timedelta(days=365)
+    edges = accounting.month_edges(year_ago.year, year_ago.month, last_month.year, last_month.month)
+    start, end = "{:%Y%m}".format(year_ago), "{:%Y%m}".format(last_month)
+
+    # List pages, timed with each template engine:
+    list_pages = [
+        ("index (show)", view("projects:index", "show")),
+        ("project_index (open)", view("projects:project_index")),
+        ("project_index (all)", view("projects:project_index", "all")),
+        ("project_index (expired)", view("projects:project_index", "expired")),
+        ("project_index (frozen)", view("projects:project_index", "frozen")),
+        ("ip_detail", view("projects:ip_detail", ip.pk)),
+        ("project_index (all, one page)", unpaginated(view("projects:project_index", "all"))),
+    ]
+
+    return [("index", view("projects:index"))] + list_pages + [
+        ("detail", view("projects:detail", project.pk)),
+        ("reservations", view("projects:reservations")),
+        ("reservation_plot_data", view("projects:reservation_plot_data")),
+        ("disk_accounting (live)", view("projects:disk_accounting", this_month.year, this_month.month)),
+        ("disk_accounting (ledger)", view("projects:disk_accounting", last_month.year, last_month.month)),
+        ("disk_accounting_range", view("projects:disk_accounting_range", start, end)),
+        ("disk_accounting_export", view("projects:disk_accounting_export", start, end, "csv")),
+        ("account_exists", view("projects:account_exists", project.user)),
+        ("Project.mk_periods", method("mk_periods")),
+        ("Project.get_disk_usage", method("get_disk_usage")),
+        ("accounting.disk_cost_matrix", lambda: accounting.disk_cost_matrix(edges)),
+    ] + [("{} [jinja2]".format(name), jinja2(get)) for name, get in list_pages]
+
+
+def time_case(function, repeat=REPEAT):
+    """Return dict with amount of queries that running 'function' takes, and
+    median and min time (seconds) of 'repeat' further runs.
+    """
+    timer = QueryTimer()
+    with connection.execute_wrapper(timer):
+        function()
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return {
+        "queries": timer.count,
+        "median": statistics.median(times),
+        "min": min(times),
+    }
+
+
+def run(sizes=SIZES, repeat=REPEAT, seed=0, log=None):
+    """Fill database with synthetic datasets of each size in 'sizes' (deleting
+    all existing data!), and time all cases on each. Return dict of results,
+    as {size: {case: {"queries": ..., "median": ..., "min": ...}}}. Progress
+    is reported through 'log' function, if given.
+    """
+    results = {}
+    with override_settings(**BENCHMARK_SETTINGS):
+        for size in sizes:
+            synthetic.clear()
+            synthetic.generate(seed=seed, **dataset_size(size))
+            now = timezone.now()
+            accounting.update_ledger(now=now)
+
+            results[str(size)] = {}
+            for name, function in get_cases(now):
+                results[str(size)][name] = time_case(function, repeat)
+                if log:
+                    log(size, name, results[str(size)][name])
+        synthetic.clear()
+
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return list of (size, case, reason) of the regressions of 'results'
+    with respect to 'baseline' (both as returned by run()): cases whose
+    fastest run (the least noisy measure) is more than 'tolerance' times
+    slower, or which take more queries.
+    """
+    regressions = []
+    for size, cases in results.items():
+        for name, result in cases.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if result["queries"] > base["queries"]:
+                reason = "{} queries, {} in baseline".format(result["queries"], base["queries"])
+                regressions.append((size, name, reason))
+            if result["min"] > tolerance*base["min"]:
+                reason = "{:.1f} ms, {:.1f} ms in baseline".format(1000*result["min"], 1000*base["min"])
+                regressions.append((size, name, reason))
+
+    return regressions
@@ -0,0 +1,92 @@
+# Standard libs:
+import json
+import logging
+import functools
+from collections import Counter
+
+# Django libs:
+from django.conf import settings
+from django.db import connection
+
+# Our libs:
+from WebProjects.metrics import QueryTimer
+
+
+# Constants:
+logger = logging.getLogger("projects.query_budget")
+
+
+# Classes:
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more queries than its budget, if
+    settings.QUERY_BUDGET_STRICT is True (as in tests).
+    """
+
+
+class StatementCounter(QueryTimer):
+    """QueryTimer that also counts how many times each SQL statement runs."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements[sql] += 1
+
+        return super().__call__(execute, sql, params, many, context)
+
+
+# Functions:
+def check_budget(request, view_name, budget, counter):
+    """Log a warning (or raise QueryBudgetExceeded, if QUERY_BUDGET_STRICT is
+    set) if 'counter' counted more queries than 'budget'.
+    """
+    if counter.count <= budget:
+        return
+
+    sql, times = counter.statements.most_common(1)[0]
+    event = {
+        "event": "query_budget_exceeded",
+        "view": view_name,
+        "path": request.get_full_path(),
+        "queries": counter.count,
+        "budget": budget,
+        "sql_time": round(counter.time, 6),
+        "most_repeated": {"sql": sql, "times": times},
+    }
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(json.dumps(event))
+
+    logger.warning(json.dumps(event), extra=event)
+
+
+def query_budget(budget):
+    """Decorator to declare that a view runs at most 'budget' queries (template
+    rendering included), whatever the size of the data.
+    """
+    def decorator(view):
+        view_name = "{}.{}".format(view.__module__, view.__name__)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = StatementCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+
+            if not response.streaming:
+                check_budget(request, view_name, budget, counter)
+                return response
+
+            # Streamed content is produced (and queried) after we return:
+            def content(chunks):
+                with connection.execute_wrapper(counter):
+                    yield from chunks
+                check_budget(request, view_name, budget, counter)
+
+            response.streaming_content = content(response.streaming_content)
+
+            return response
+
+        return wrapper
+
+    return decorator
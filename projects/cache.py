@@ -0,0 +1,108 @@
+# Standard libs:
+import math
+import time
+import hashlib
+import functools
+from datetime import datetime, timezone
+
+# Django libs:
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+
+# Constants:
+DATA_VERSION_KEY = "projects:data_version"
+
+
+# Functions:
+def get_data_version():
+    """Return the data version: the time (in seconds since epoch) of the last
+    change to IPs, Projects, Periods or Reservations, as stored in the shared
+    cache. If unknown (e.g. evicted), take current time as new version.
+    """
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, time.time(), timeout=None)
+        version = cache.get(DATA_VERSION_KEY, time.time())
+
+    return version
+
+
+def bump_data_version():
+    """Mark data as changed, which invalidates all cached views."""
+
+    cache.set(DATA_VERSION_KEY, time.time(), timeout=None)
+
+
+def get_view_version(time_dependent=False):
+    """Return the version of the output of a view: the data version or, if
+    'time_dependent' (the output depends on current time too, and is taken to
+    change every minute), the start of the current minute if later.
+    """
+    version = get_data_version()
+    if time_dependent:
+        version = max(version, time.time()//60*60)
+
+    return version
+
+
+def cache_view(view=None, time_dependent=False):
+    """Decorator to cache successful GET responses of 'view', keyed by view
+    name, full path (arguments and GET parameters included) and view version
+    (see get_view_version()). Requests being profiled (see
+    WebProjects/profiling.py) skip the cache. Use as @cache_view, or as
+    @cache_view(time_dependent=True).
+    """
+    if view is None:
+        return functools.partial(cache_view, time_dependent=time_dependent)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ["GET", "HEAD"] or getattr(request, "profiling", False):
+            return view(request, *args, **kwargs)
+
+        path_hash = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+        key = "projects:view:{}:{}:{}".format(view.__name__, get_view_version(time_dependent), path_hash)
+
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response, settings.VIEW_CACHE_TIMEOUT)
+
+        return response
+
+    return wrapper
+
+
+def data_condition(time_dependent=False):
+    """Decorator to answer conditional GETs to a data view (ETag and
+    Last-Modified headers, and 304 Not Modified responses) from the view
+    version (see get_view_version()) alone, without running the view.
+
+    The ETag is the version itself, and If-None-Match is checked first. As
+    HTTP dates have a resolution of one second, Last-Modified is the time of
+    the response instead, and If-Modified-Since alone only gets a 304 if the
+    version is older than it, to the second: a change after the response
+    always makes it stale.
+    """
+    def etag(request, *args, **kwargs):
+        return "{:.6f}".format(get_view_version(time_dependent))
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(math.ceil(get_view_version(time_dependent)), tz=timezone.utc)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def timestamped_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response["Last-Modified"] = http_date(time.time())
+
+            return response
+
+        return condition(etag_func=etag, last_modified_func=last_modified)(timestamped_view)
+
+    return decorator
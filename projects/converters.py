@@ -27,3 +27,18 @@ class NameWithSpaces(object):
 
     def to_url(self, value):
         return value
+
+
+class YearMonth(object):
+    """Month in YYYYMM format. Months out of 01-12 do not match (404)."""
+    regex = '\d{6}'
+
+    def to_python(self, value):
+        year, month = int(value[:4]), int(value[4:])
+        if not 1 <= year < 9999 or not 1 <= month <= 12:
+            raise ValueError("Invalid month: {}".format(value))
+
+        return value
+
+    def to_url(self, value):
+        return value
@@ -0,0 +1,229 @@
+# Standard libs:
+import os
+import sys
+import json
+import time
+import random
+import socket
+import threading
+import subprocess
+import http.client
+from datetime import date
+
+# Django libs:
+from django.conf import settings
+
+
+# Constants:
+APP = "WebProjects.wsgi:application"
+STARTUP_TIMEOUT = 60  # seconds to wait for gunicorn to answer
+REQUEST_TIMEOUT = 60  # seconds to wait for each response
+
+# Cache modes to load-test, by label: whether views are cached:
+CACHE_MODES = {"cache": True, "no cache": False}
+
+# Default weight of each endpoint in the mix of requests:
+MIX = {
+    "index": 2,
+    "project_index": 3,
+    "detail": 3,
+    "disk_accounting": 1,
+    "reservation_plot_data": 1,
+}
+
+
+# Functions:
+def mk_url(endpoint, rng, n_projects):
+    """Return path of a random request to 'endpoint', for a synthetic dataset
+    (see projects/synthetic.py) of 'n_projects' Projects, fresh in a new
+    database (so that Project pks go from 1 to n_projects).
+    """
+    if endpoint == "index":
+        return rng.choice(["/", "/show"])
+    elif endpoint == "project_index":
+        status = rng.choice(["open", "open", "expired", "frozen", "all"])
+        return "/projects/{}?sort={}".format(status, rng.choice(["id", "-quota", "end", "ip"]))
+    elif endpoint == "detail":
+        return "/project/{}".format(rng.randint(1, n_projects))
+    elif endpoint == "disk_accounting":
+        months_ago = rng.randint(0, 35)
+        today = date.today()
+        year, month = divmod(today.year*12 + today.month - 1 - months_ago, 12)
+        return "/disk_accounting/{}/{}".format(year, month + 1)
+    elif endpoint == "reservation_plot_data":
+        return "/reservation_plot_data?points={}".format(rng.choice([200, 500, 1000]))
+
+    raise ValueError("Unknown endpoint: {}".format(endpoint))
+
+
+def percentile(values, q):
+    """Return the 'q'-th percentile (0 < q <= 100) of sorted 'values', by the
+    nearest-rank method.
+    """
+    rank = max(1, -(-len(values)*q//100))  # ceil
+
+    return values[int(rank) - 1]
+
+
+def summarize(samples, duration):
+    """Return dict of stats by endpoint (plus "all") out of 'samples', a list
+    of (endpoint, latency, ok) of requests made in 'duration' seconds.
+    """
+    by_endpoint = {}
+    for endpoint, latency, ok in samples:
+        for key in [endpoint, "all"]:
+            by_endpoint.setdefault(key, []).append((latency, ok))
+
+    stats = {}
+    for key, values in by_endpoint.items():
+        latencies = sorted([latency for latency, ok in values])
+        stats[key] = {
+            "requests": len(values),
+            "errors": len([ok for latency, ok in values if not ok]),
+            "throughput": len(values)/duration,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+
+    return stats
+
+
+def drive(port, mix, n_projects, concurrency, duration, seed=0):
+    """Make requests to the server at 'port' from 'concurrency' threads for
+    'duration' seconds, picking endpoints at random with the weights in
+    'mix'. Return list of (endpoint, latency, ok) samples.
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    endpoints, weights = list(mix), list(mix.values())
+
+    def client(i):
+        rng = random.Random(seed + i)
+        mine = []
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights=weights)[0]
+            url = mk_url(endpoint, rng, n_projects)
+            start = time.perf_counter()
+            try:
+                status = get(port, url)
+            except (OSError, http.client.HTTPException):
+                status = None
+            mine.append((endpoint, time.perf_counter() - start, status == 200))
+        with lock:
+            samples.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return samples
+
+
+def get(port, url):
+    """GET 'url' from the server at 'port', and return the status code."""
+
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    try:
+        conn.request("GET", url)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def free_port():
+    """Return a free TCP port on localhost."""
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_conf(tmpdir, cache=True):
+    """Write to 'tmpdir' a WebProjects.json for a server isolated from the
+    configured one: same settings, but database, cache, metrics and logs in
+    'tmpdir', and DEBUG off. With 'cache' False, views are not cached. Confs
+    with and without cache share the database. Return its path.
+    """
+    suffix = "" if cache else "_nocache"
+    conf = dict(settings.J)
+    conf.update({
+        "DEBUG": False,
+        "DBFILE": os.path.join(tmpdir, "loadtest.db"),
+        "CACHE_DIR": os.path.join(tmpdir, "cache" + suffix),
+        "METRICS_DIR": os.path.join(tmpdir, "metrics"),
+        "PROFILE_DIR": os.path.join(tmpdir, "profiles"),
+        "SLOW_QUERY_LOG": os.path.join(tmpdir, "slow_queries.log"),
+    })
+    conf.pop("DATABASE_URL", None)
+    if not cache:
+        conf["VIEW_CACHE_TIMEOUT"] = 0
+
+    path = os.path.join(tmpdir, "WebProjects{}.json".format(suffix))
+    with open(path, "w") as f:
+        json.dump(conf, f, indent=2)
+
+    return path
+
+
+def server_env(conf):
+    """Return environment for processes using WebProjects.json 'conf'."""
+
+    env = dict(os.environ, WEBPROJECTS_CONF=conf)
+    env.pop("DATABASE_URL", None)
+
+    return env
+
+
+def get_root():
+    """Return directory of manage.py."""
+
+    return os.path.dirname(settings.PROJECT_PATH)
+
+
+def manage(conf, *args):
+    """Run manage.py command with 'args', with WebProjects.json 'conf'."""
+
+    subprocess.run([sys.executable, "manage.py"] + [str(a) for a in args], cwd=get_root(), env=server_env(conf),
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+# Classes:
+class Server(object):
+    """gunicorn serving 'app' with WebProjects.json 'conf', as a context manager."""
+
+    def __init__(self, conf, workers, threads=1, app=APP):
+        self.port = free_port()
+        self.args = [sys.executable, "-m", "gunicorn", app,
+                     "--bind", "127.0.0.1:{}".format(self.port),
+                     "--workers", str(workers), "--threads", str(threads),
+                     "--log-level", "warning"]
+        self.env = server_env(conf)
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.args, cwd=get_root(), env=self.env)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                if get(self.port, "/readme") == 200:
+                    return self
+            except (OSError, http.client.HTTPException):
+                pass
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.__exit__()
+                raise RuntimeError("gunicorn did not start: {}".format(" ".join(self.args)))
+            time.sleep(0.2)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
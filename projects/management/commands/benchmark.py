@@ -0,0 +1,69 @@
+# Standard libs:
+import json
+
+# Django libs:
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+# Our libs:
+from projects import benchmark
+
+
+# Classes:
+class Command(BaseCommand):
+    help = ("Time views and model methods, and count their queries, on synthetic datasets of several sizes. "
+            "Runs on a fresh test database, so the configured one is never touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default=",".join([str(s) for s in benchmark.SIZES]),
+                            help="Comma-separated dataset sizes, in amount of Projects. Default: %(default)s.")
+        parser.add_argument("--repeat", type=int, default=benchmark.REPEAT,
+                            help="Timed runs of each case. Default: %(default)s.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the dataset generator. Default: %(default)s.")
+        parser.add_argument("--save", metavar="FILE",
+                            help="Save results to FILE (JSON), to use as baseline later.")
+        parser.add_argument("--compare", metavar="FILE",
+                            help="Compare with baseline results in FILE, and fail if there are regressions.")
+        parser.add_argument("--tolerance", type=float, default=benchmark.TOLERANCE,
+                            help="Max ratio of time to baseline time not considered a regression. "
+                                 "Default: %(default)s.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("Sizes must be comma-separated integers.")
+
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+
+        def log(size, name, result):
+            base = baseline.get(str(size), {}).get(name)
+            ratio = "{:8.2f}".format(result["min"]/base["min"]) if base else ""
+            self.stdout.write("{:>7} {:<40} {:>7} {:>10.2f} {:>10.2f} {}".format(
+                size, name, result["queries"], 1000*result["median"], 1000*result["min"], ratio))
+
+        self.stdout.write("{:>7} {:<40} {:>7} {:>10} {:>10} {}".format(
+            "size", "case", "queries", "median ms", "min ms", "vs. baseline" if baseline else ""))
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = benchmark.run(sizes, repeat=options["repeat"], seed=options["seed"], log=log)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write("Results saved to {}.".format(options["save"]))
+
+        if options["compare"]:
+            regressions = benchmark.compare(results, baseline, options["tolerance"])
+            for size, name, reason in regressions:
+                self.stdout.write("Regression at size {}, {}: {}.".format(size, name, reason))
+            if regressions:
+                raise CommandError("{} regressions with respect to {}.".format(len(regressions), options["compare"]))
+            self.stdout.write("No regressions with respect to {}.".format(options["compare"]))
@@ -0,0 +1,35 @@
+# Django libs:
+from django.core.management.base import BaseCommand, CommandError
+
+# Our libs:
+from projects import synthetic
+
+
+# Classes:
+class Command(BaseCommand):
+    help = ("Fill the database with a synthetic dataset of IPs, Projects (with realistic Period histories) "
+            "and Reservations, e.g. to measure how views scale. Do not run it against production data!")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ips", type=int, default=100,
+                            help="Amount of IPs to create. Default: %(default)s.")
+        parser.add_argument("--projects", type=int, default=1000,
+                            help="Amount of Projects to create. Default: %(default)s.")
+        parser.add_argument("--reservations", type=int, default=100,
+                            help="Amount of Reservations to create. Default: %(default)s.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of random generator, for reproducible datasets. Default: %(default)s.")
+        parser.add_argument("--clear", action="store_true",
+                            help="Delete all existing IPs, Projects and Reservations first.")
+
+    def handle(self, *args, **options):
+        if options["projects"] and options["ips"] < 1:
+            raise CommandError("At least one IP is needed to create Projects.")
+
+        if options["clear"]:
+            synthetic.clear()
+
+        created = synthetic.generate(options["ips"], options["projects"], options["reservations"],
+                                     seed=options["seed"])
+
+        self.stdout.write("Created " + ", ".join(["{} {}s".format(n, name) for name, n in created.items()]) + ".")
@@ -0,0 +1,111 @@
+# Standard libs:
+import json
+import tempfile
+import importlib.util
+
+# Django libs:
+from django.core.management.base import BaseCommand, CommandError
+
+# Our libs:
+from projects import loadtest
+
+
+# Functions:
+def int_list(string):
+    """Return list of ints in comma-separated 'string'."""
+
+    return [int(x) for x in string.split(",")]
+
+
+def mix(string):
+    """Return mix of endpoints (dict of name: weight) in 'string', e.g. "index=1,detail=3"."""
+
+    weights = {}
+    for item in string.split(","):
+        name, weight = item.split("=")
+        if name not in loadtest.MIX:
+            raise ValueError("unknown endpoint {}".format(name))
+        weights[name] = float(weight)
+
+    return weights
+
+
+# Classes:
+class Command(BaseCommand):
+    help = ("Load-test the app under gunicorn, with several worker and thread counts, on a synthetic database, "
+            "and report throughput and latency percentiles by endpoint. Nothing configured is touched: database, "
+            "cache and logs are created in a temporary directory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int_list, default=[1, 2, 4],
+                            help="Comma-separated gunicorn worker counts to try. Default: 1,2,4.")
+        parser.add_argument("--threads", type=int_list, default=[1],
+                            help="Comma-separated gunicorn thread (per worker) counts to try. Default: 1.")
+        parser.add_argument("--concurrency", type=int, default=8,
+                            help="Amount of concurrent clients. Default: %(default)s.")
+        parser.add_argument("--duration", type=float, default=15,
+                            help="Seconds to load each configuration. Default: %(default)s.")
+        parser.add_argument("--projects", type=int, default=2000,
+                            help="Amount of Projects in the synthetic database. Default: %(default)s.")
+        parser.add_argument("--mix", type=mix, default=loadtest.MIX,
+                            help="Weights of endpoints, as in the default: {}.".format(
+                                ",".join(["{}={}".format(k, v) for k, v in loadtest.MIX.items()])))
+        parser.add_argument("--cache", choices=["both", "on", "off"], default="both",
+                            help="Load-test with view caching on, off, or both. Default: %(default)s.")
+        parser.add_argument("--app", default=loadtest.APP,
+                            help="WSGI app for gunicorn. Default: %(default)s.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the dataset and of the choice of requests. Default: %(default)s.")
+        parser.add_argument("--output", metavar="FILE",
+                            help="Save results to FILE (JSON).")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec("gunicorn") is None:
+            raise CommandError("gunicorn is not installed.")
+
+        n = options["projects"]
+        modes = [mode for mode, cache in loadtest.CACHE_MODES.items()
+                 if options["cache"] == "both" or cache == (options["cache"] == "on")]
+        results = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            confs = dict([(mode, loadtest.write_conf(tmpdir, cache=loadtest.CACHE_MODES[mode])) for mode in modes])
+
+            self.stdout.write("Creating synthetic database with {} projects...".format(n))
+            conf = confs[modes[0]]
+            loadtest.manage(conf, "migrate")
+            loadtest.manage(conf, "generate_dataset", "--projects", n, "--ips", max(1, n//10),
+                            "--reservations", max(10, n//20), "--seed", options["seed"])
+            loadtest.manage(conf, "update_ledger")
+
+            for mode in modes:
+                for workers in options["workers"]:
+                    for threads in options["threads"]:
+                        with loadtest.Server(confs[mode], workers, threads, app=options["app"]) as server:
+                            loadtest.drive(server.port, options["mix"], n, 1, 1)  # warm up
+                            samples = loadtest.drive(server.port, options["mix"], n, options["concurrency"],
+                                                     options["duration"], seed=options["seed"])
+                        stats = loadtest.summarize(samples, options["duration"])
+                        results.append({"cache": mode, "workers": workers, "threads": threads, "stats": stats})
+                        self.report(mode, workers, threads, stats)
+
+        self.stdout.write("\nSummary ({} concurrent clients):".format(options["concurrency"]))
+        self.stdout.write("{:<8} {:>7} {:>7} {:>9} {:>7} {:>9} {:>9} {:>9}".format(
+            "cache", "workers", "threads", "req/s", "errors", "p50 ms", "p95 ms", "p99 ms"))
+        for result in results:
+            s = result["stats"].get("all")
+            if s:
+                self.stdout.write("{:<8} {:>7} {:>7} {:>9.1f} {:>7} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                    result["cache"], result["workers"], result["threads"], s["throughput"], s["errors"],
+                    1000*s["p50"], 1000*s["p95"], 1000*s["p99"]))
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def report(self, mode, workers, threads, stats):
+        self.stdout.write("\n{}, {} workers, {} threads:".format(mode.capitalize(), workers, threads))
+        self.stdout.write("{:<22} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+        for endpoint, s in sorted(stats.items(), key=lambda x: x[0] == "all"):
+            self.stdout.write("{:<22} {:>8} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                endpoint, s["requests"], s["errors"], s["throughput"], 1000*s["p50"], 1000*s["p95"], 1000*s["p99"]))
@@ -0,0 +1,25 @@
+# Django libs:
+from django.core.management.base import BaseCommand
+
+# Our libs:
+from projects.models import Project
+
+
+# Classes:
+class Command(BaseCommand):
+    help = "Rebuild the summary columns (start, end, quotas, status) of Projects from their Periods."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Amount of Projects to update per query. Default: %(default)s.")
+        parser.add_argument("--open", action="store_true",
+                            help="Only rebuild not finished Projects.")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options["open"]:
+            projects = projects.filter(finished=False)
+
+        n = projects.update_summaries(batch_size=options["batch_size"])
+
+        self.stdout.write("Rebuilt summary of {} projects.".format(n))
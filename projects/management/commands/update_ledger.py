@@ -0,0 +1,21 @@
+# Django libs:
+from django.core.management.base import BaseCommand
+
+# Our libs:
+from projects import accounting
+
+
+# Classes:
+class Command(BaseCommand):
+    help = "Store in the ledger the disk accounting of closed months that changed since last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Recompute all closed months, not only the changed ones.")
+
+    def handle(self, *args, **options):
+        months = accounting.update_ledger(full=options["full"])
+
+        for year, month in months:
+            self.stdout.write("Updated {}-{:02d}".format(year, month))
+        self.stdout.write("Updated {} months.".format(len(months)))
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:18
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_summary(apps, schema_editor):
+    """Compute summary columns of existing Projects from their Periods."""
+
+    Project = apps.get_model('projects', 'Project')
+    Period = apps.get_model('projects', 'Period')
+    now = timezone.now()
+
+    for project in Project.objects.all():
+        periods = list(Period.objects.filter(proj=project))
+        active = [p for p in periods if p.status == 'active']
+
+        project.start = min([p.start for p in active]) if active else None
+        project.end = max([p.end for p in active]) if active else None
+        project.max_quota = max([p.quota for p in periods] + [0])
+        if periods and not project.finished:
+            project.current_quota = max(periods, key=lambda p: p.end).quota
+
+        if project.finished:
+            project.status = 'finished'
+        elif project.in_buffer:
+            project.status = 'frozen'
+        elif project.end and project.end < now:
+            project.status = 'expired'
+
+        project.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='current_quota',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='end',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Ending date'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='max_quota',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='start',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Starting date'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='status',
+            field=models.CharField(db_index=True, default='active', editable=False, max_length=25),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
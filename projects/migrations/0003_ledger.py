@@ -0,0 +1,42 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_project_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='First day of month')),
+                ('computed', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Computation date')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='period',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modification date'),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disk_cost', models.FloatField(default=0)),
+                ('gbd', models.FloatField(default=0, verbose_name='Disk usage (GB*day)')),
+                ('month', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.ledgermonth')),
+                ('proj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(fields=('month', 'proj'), name='unique_ledger_entry'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['end', 'start'], name='reservation_end_start_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import unicodedata
+
+
+def fill_trigrams(apps, schema_editor):
+    """Index trigrams of names of existing IPs."""
+
+    IP = apps.get_model('projects', 'IP')
+    IPTrigram = apps.get_model('projects', 'IPTrigram')
+
+    trigrams = []
+    for ip in IP.objects.all():
+        name = unicodedata.normalize('NFKD', ip.ip_name)
+        name = ' '.join(''.join([c for c in name if not unicodedata.combining(c)]).casefold().split())
+        for t in sorted(set([name[i:i+3] for i in range(len(name) - 2)])):
+            trigrams.append(IPTrigram(ip=ip, trigram=t))
+    IPTrigram.objects.bulk_create(trigrams)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_reservation_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IPTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('ip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.ip')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'ip'], name='iptrigram_trigram_ip_idx')],
+            },
+        ),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_ip_trigrams'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='user',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+    ]
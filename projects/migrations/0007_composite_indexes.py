@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_project_user_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['proj', 'status', 'start'], name='period_proj_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['proj', 'end'], name='period_proj_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='period',
+            index=models.Index(fields=['start', 'end'], name='period_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('finished', False), ('in_buffer', False)), fields=['end'], name='project_open_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('in_buffer', True)), fields=['end'], name='project_frozen_end_idx'),
+        ),
+    ]
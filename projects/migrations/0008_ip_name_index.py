@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ip',
+            name='ip_name',
+            field=models.CharField(db_index=True, max_length=200, verbose_name='Name of IP'),
+        ),
+    ]
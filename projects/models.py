@@ -1,11 +1,19 @@
 # Django stuff:
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 # Standard libs:
+import unicodedata
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta as rdelta
 
+# Our libs:
+from projects import cache
+
 # Constants:
 DISK_PRICE = 0.50  # euros per TB day
 PENALTY_EXPIRED = 1.50  # multiplier for DISK_PRICE over expired periods
@@ -29,9 +37,105 @@ def num2eng(num, decimals=2):
         return fmt.format(num)
 
 
+def normalize_name(name):
+    """Return 'name' case- and accent-folded, with whitespace collapsed.
+    E.g.:
+    normalize_name("  Iñaki   SILANES") = "inaki silanes"
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join([c for c in name if not unicodedata.combining(c)])
+
+    return " ".join(name.casefold().split())
+
+
+def name_trigrams(name):
+    """Return set of trigrams (substrings of length 3) of normalized 'name'."""
+
+    return set([name[i:i+3] for i in range(len(name) - 2)])
+
+
+# QuerySets:
+class IPQuerySet(models.QuerySet):
+
+    def resolve(self, fragments):
+        """Return dict with the single IP in queryset whose name contains each
+        name fragment in 'fragments' (ignoring case and accents), or None if
+        no IP or several of them do. Candidates are found through the trigram
+        index (IPTrigram), in two queries for all fragments.
+        """
+        key_of = dict([(f, normalize_name(f)) for f in fragments])
+        trigrams_of = dict([(k, name_trigrams(k)) for k in key_of.values()])
+
+        # IPs having each trigram:
+        ips_with = {}
+        all_trigrams = set().union(*trigrams_of.values())
+        if all_trigrams:
+            for ip_id, trigram in IPTrigram.objects.filter(trigram__in=all_trigrams).values_list("ip_id", "trigram"):
+                ips_with.setdefault(trigram, set()).add(ip_id)
+
+        # Candidates of each fragment have all its trigrams (fragments shorter
+        # than a trigram need checking all IPs):
+        candidates_of = {}
+        for key, trigrams in trigrams_of.items():
+            if trigrams:
+                candidates_of[key] = set.intersection(*[ips_with.get(t, set()) for t in trigrams])
+
+        ips = self
+        if len(candidates_of) == len(trigrams_of):
+            ips = ips.filter(pk__in=set().union(*candidates_of.values()))
+        name_of = dict([(ip, normalize_name(ip.ip_name)) for ip in ips])
+
+        ip_of = {}
+        for fragment, key in key_of.items():
+            candidates = candidates_of.get(key)
+            matches = [ip for ip, name in name_of.items() if (candidates is None or ip.pk in candidates) and key in name]
+            ip_of[fragment] = matches[0] if len(matches) == 1 else None
+
+        return ip_of
+
+
+    def with_project_summary(self):
+        """Annotate each IP with the aggregates that get_n_projs() and
+        get_quota_raw() compute in Python, in a single query:
+        n_open, n_total: amount of open and total projects.
+        quota_open, quota_total: aggregated current quota (GB) of open and
+        of all projects (finished projects count as 0, as in get_quota()).
+        """
+        is_open = models.Q(project__finished=False)
+
+        return self.annotate(
+            n_open=models.Count("project", filter=is_open),
+            n_total=models.Count("project"),
+            quota_open=Coalesce(models.Sum("project__current_quota", filter=is_open), 0.0),
+            quota_total=Coalesce(models.Sum("project__current_quota"), 0.0),
+        )
+
+
+class ProjectQuerySet(models.QuerySet):
+
+    def update_summaries(self, batch_size=500):
+        """Recompute the summary columns of all Projects in queryset from
+        their Periods, and store them in bulk. Return amount of Projects.
+        """
+        n = 0
+        projects = self.prefetch_related("period_set").order_by("pk")
+        for i in range(0, projects.count(), batch_size):
+            batch = list(projects[i:i+batch_size])
+            for project in batch:
+                for field, value in project.get_summary().items():
+                    setattr(project, field, value)
+            Project.objects.bulk_update(batch, Project.SUMMARY_FIELDS)
+            n += len(batch)
+        cache.bump_data_version()
+
+        return n
+
+
 # Classes:
 class IP(models.Model):
-    ip_name = models.CharField('Name of IP', max_length=200)
+    ip_name = models.CharField('Name of IP', max_length=200, db_index=True)
+
+    objects = IPQuerySet.as_manager()
 
     # Public methods:
     def get_n_projs(self):
@@ -87,6 +191,13 @@ class IP(models.Model):
     def get_open_projs(self):
         return [ x for x in self.project_set.all() if not x.finished ]
 
+    def update_trigrams(self):
+        """Store trigrams of name in the IPTrigram index."""
+
+        self.iptrigram_set.all().delete()
+        trigrams = name_trigrams(normalize_name(self.ip_name))
+        IPTrigram.objects.bulk_create([IPTrigram(ip=self, trigram=t) for t in sorted(trigrams)])
+
     # Special methods:
     def __unicode__(self):
         return self.ip_name
@@ -95,21 +206,59 @@ class IP(models.Model):
         return self.ip_name
 
 
+class IPTrigram(models.Model):
+    """Trigram of the normalized name of an IP, to find IPs by name fragment."""
+
+    ip = models.ForeignKey(IP, on_delete=models.CASCADE)
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["trigram", "ip"], name="iptrigram_trigram_ip_idx"),
+        ]
+
+    # Special methods:
+    def __str__(self):
+        return "'{s.trigram}' of IP {s.ip_id}".format(s=self)
+
+
 class Project(models.Model):
     ip = models.ForeignKey(IP, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
-    user = models.CharField(max_length=20)
+    user = models.CharField(max_length=20, db_index=True)
     finished = models.BooleanField(default=False)
     in_buffer = models.BooleanField(default=False)
     cpuh = models.FloatField(default=0.0)
     proj_id = models.CharField(max_length=100)
 
+    # Summary of the Periods of the Project, kept in sync on every Period
+    # write (see update_summary()), to filter and sort on them in SQL. Only
+    # 'status' depends on time too (a Project expires when its end passes
+    # with no write), so it goes stale until the rebuild_project_summary
+    # command is run (from cron, see README). Views compare 'end' with now:
+    start = models.DateTimeField("Starting date", null=True, editable=False)
+    end = models.DateTimeField("Ending date", null=True, editable=False, db_index=True)
+    current_quota = models.FloatField(default=0, editable=False, db_index=True)
+    max_quota = models.FloatField(default=0, editable=False)
+    status = models.CharField(max_length=25, default="active", editable=False, db_index=True)
+
+    SUMMARY_FIELDS = ["start", "end", "current_quota", "max_quota", "status"]
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["end"], name="project_open_end_idx",
+                         condition=models.Q(finished=False, in_buffer=False)),
+            models.Index(fields=["end"], name="project_frozen_end_idx", condition=models.Q(in_buffer=True)),
+        ]
+
     # Public methods:
     def get_max_quota(self):
         """Return the largest quota the Project has ever had."""
 
         max_q = 0
-        for p in self.period_set.all():
+        for p in self.periods:
             if p.quota > max_q:
                 max_q = p.quota
 
@@ -136,7 +285,7 @@ class Project(models.Model):
         """
         periods = []
         old_end, old_q = None, None
-        for p in Period.objects.filter(proj=self.id).order_by("start"):
+        for p in self.periods:
             start_date = p.start
             if old_end and start_date.date() == old_end.date():
                 start_date += rdelta(days=1)
@@ -175,7 +324,7 @@ class Project(models.Model):
     def get_disk_usage(self):
         """Returns amount of GB*day used throughout the Project."""
 
-        ordered_projects = self.period_set.order_by("start")
+        ordered_projects = self.periods
 
         gbd = 0
         prev_q = None
@@ -208,7 +357,7 @@ class Project(models.Model):
         """Returns starting date, or None."""
 
         try:
-            return Period.objects.filter(proj=self).filter(status="active").order_by("start")[0].start
+            return [p for p in self.periods if p.status == "active"][0].start
         except:
             return None
 
@@ -224,7 +373,7 @@ class Project(models.Model):
         """Return end date, as defined by ending of latest active period."""
 
         try:
-            return Period.objects.filter(proj=self).filter(status="active").order_by("-end")[0].end
+            return max([p.end for p in self.periods if p.status == "active"])
         except:
             return None
 
@@ -242,7 +391,7 @@ class Project(models.Model):
         the date on which the project leaves Neptuno).
         """
         end = None
-        for period in self.period_set.all():
+        for period in self.periods:
             if period.status in [ "active", "expired" ]:
                 d = period.end
                 if not end or d > end:
@@ -260,7 +409,7 @@ class Project(models.Model):
         period, either active, expired, or frozen.
         """
         end = None
-        for period in self.period_set.all():
+        for period in self.periods:
             d = period.end
             if not end or d > end:
                 end = d
@@ -280,7 +429,7 @@ class Project(models.Model):
         if self.finished:
             return 0
 
-        return Period.objects.filter(proj=self.pk).order_by("-end")[0].quota
+        return sorted(self.periods, key=lambda p: p.end)[-1].quota
 
     def get_status(self):
         """Return status of Project, as a string.
@@ -302,8 +451,60 @@ class Project(models.Model):
     def get_cpuh_str(self):
         return num2eng(self.cpuh,1)
 
+    def get_summary(self):
+        """Return dict with the values of the summary columns, as computed
+        from the Periods. 'status' is one of 'finished', 'frozen', 'expired'
+        or 'active', as of the time of computing it.
+        """
+        end = self.get_end()
+
+        if self.finished:
+            status = "finished"
+        elif self.in_buffer:
+            status = "frozen"
+        elif end and end < timezone.now():
+            status = "expired"
+        else:
+            status = "active"
+
+        return {
+            "start": self.get_start(),
+            "end": end,
+            "current_quota": self.get_quota() if self.periods else 0,
+            "max_quota": self.get_max_quota(),
+            "status": status,
+        }
+
+    def update_summary(self):
+        """Recompute summary columns from the Periods, and store them
+        without going through save().
+        """
+        self.__dict__.pop("periods", None)
+        summary = self.get_summary()
+        for field, value in summary.items():
+            setattr(self, field, value)
+
+        Project.objects.filter(pk=self.pk).update(**summary)
+
+    def refresh_from_db(self, *args, **kwargs):
+        """Reload from database, forgetting the cached list of periods too."""
+
+        super().refresh_from_db(*args, **kwargs)
+        self.__dict__.pop("periods", None)
+
 
     # Public properties:
+    @cached_property
+    def periods(self):
+        """List of Periods of Project, ordered by start date. It is fetched
+        only once per instance (or taken from prefetch_related('period_set')),
+        and all the methods above read from it.
+        """
+        if self.pk is None:
+            return []
+
+        return sorted(self.period_set.all(), key=lambda p: p.start)
+
     @property
     def is_expired(self):
         """Return 1 if expired, 0 if still active."""
@@ -317,10 +518,11 @@ class Project(models.Model):
     def how_long_ago_expired(self):
         """How many days ago it expired. Return 0 if not expired."""
 
-        if not self.is_expired:
+        end = self.get_end()
+        if end >= timezone.now():
             return 0
 
-        return (timezone.now() - self.get_end()).days
+        return (timezone.now() - end).days
 
     @property
     def ihbuffer_date(self):
@@ -348,6 +550,16 @@ class Project(models.Model):
 
 
     # Special methods:
+    def save(self, *args, **kwargs):
+        # 'finished' and 'in_buffer' affect the summary too:
+        self.__dict__.pop("periods", None)
+        for field, value in self.get_summary().items():
+            setattr(self, field, value)
+
+        super().save(*args, **kwargs)
+        # A new instance cached an empty list of Periods above (it had no pk):
+        self.__dict__.pop("periods", None)
+
     def __unicode__(self):
         fmt  = u"Account {s.user} for project '{s.name}' with ID '{s.proj_id}' and IP {s.ip}."
         fmt += u" Opens on {sd}, closes on {se}."
@@ -374,6 +586,16 @@ class Period(models.Model):
     # frozen - in buffer
     status = models.CharField(max_length=25, default="active")
 
+    # Last time the Period was written (see update_ledger command):
+    modified = models.DateTimeField("Modification date", auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["proj", "status", "start"], name="period_proj_status_start_idx"),
+            models.Index(fields=["proj", "end"], name="period_proj_end_idx"),
+            models.Index(fields=["start", "end"], name="period_start_end_idx"),
+        ]
+
     # Public methods:
     def overlap(self, start, end):
         """Returns days of overlap of Period with (start, end) period."""
@@ -413,12 +635,57 @@ class Period(models.Model):
         return self.__unicode__()
 
 
+class LedgerMonth(models.Model):
+    """A closed month whose disk accounting is stored in the ledger, as
+    one LedgerEntry per Project. Months are deleted (with their entries)
+    whenever a Period overlapping them changes, and recomputed by the
+    update_ledger command.
+    """
+    month = models.DateField("First day of month", unique=True)
+    computed = models.DateTimeField("Computation date", default=timezone.now)
+
+    # Public methods:
+    @classmethod
+    def invalidate(cls, start, end):
+        """Delete stored months overlapping with (start, end) period."""
+
+        first = timezone.localtime(start).date().replace(day=1)
+        last = timezone.localtime(end).date()
+        cls.objects.filter(month__gte=first, month__lte=last).delete()
+
+
+    # Special methods:
+    def __str__(self):
+        return "Ledger for {s.month:%Y-%m}, computed on {s.computed:%Y-%m-%d %H:%M}".format(s=self)
+
+
+class LedgerEntry(models.Model):
+    month = models.ForeignKey(LedgerMonth, on_delete=models.CASCADE)
+    proj = models.ForeignKey(Project, on_delete=models.CASCADE)
+    disk_cost = models.FloatField(default=0)
+    gbd = models.FloatField("Disk usage (GB*day)", default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["month", "proj"], name="unique_ledger_entry"),
+        ]
+
+    # Special methods:
+    def __str__(self):
+        return "{s.disk_cost:.2f} for project {s.proj_id} in {s.month.month:%Y-%m}".format(s=self)
+
+
 class Reservation(models.Model):
     name = models.CharField("Name of reservation", max_length=50, default="reservation")
     start = models.DateTimeField("Starting date", default=timezone.now)
     end = models.DateTimeField("Ending date", default=timezone.now)
     nodes = models.IntegerField("Amount of nodes", default=1)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["end", "start"], name="reservation_end_start_idx"),
+        ]
+
     # Public methods:
     def is_active_on(self, day):
         """Return True if reservation is active on day 'day'."""
@@ -462,3 +729,54 @@ class Reservation(models.Model):
     def __str__(self):
         return "{s.name}: {s.nodes} nodes from {s.start:%Y-%m-%d} to {s.end:%Y-%m-%d}".format(s=self)
 
+
+
+# Signal handlers:
+@receiver(post_save, sender=IP)
+def ip_changed(sender, instance, **kwargs):
+    """Keep trigram index of IP names in sync."""
+
+    if kwargs.get("raw"):
+        return
+
+    instance.update_trigrams()
+
+
+@receiver(pre_save, sender=Period)
+def period_changing(sender, instance, **kwargs):
+    """Invalidate ledger months that a Period covered before changing, and
+    record its Project before changing, for period_changed() to update it
+    too if the Period is moved to another one.
+    """
+    if kwargs.get("raw") or instance.pk is None:
+        return
+
+    old = Period.objects.filter(pk=instance.pk).values_list("start", "end", "proj_id").first()
+    if old is not None:
+        LedgerMonth.invalidate(old[0], old[1])
+        instance._old_proj_id = old[2]
+
+
+@receiver([post_save, post_delete], sender=Period)
+def period_changed(sender, instance, **kwargs):
+    """Keep summary columns of the Project of a Period (and of the one it was
+    moved from, if any), and the ledger, in sync.
+    """
+    if kwargs.get("raw"):
+        return
+
+    LedgerMonth.invalidate(instance.start, instance.end)
+
+    pks = set([instance.proj_id, instance.__dict__.pop("_old_proj_id", instance.proj_id)])
+    for project in Project.objects.filter(pk__in=pks):
+        project.update_summary()
+
+
+@receiver([post_save, post_delete], sender=IP)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Period)
+@receiver([post_save, post_delete], sender=Reservation)
+def data_changed(sender, **kwargs):
+    """Invalidate cached views."""
+
+    cache.bump_data_version()
@@ -0,0 +1,167 @@
+# Standard libs:
+import json
+import base64
+import binascii
+import functools
+from datetime import datetime
+from urllib.parse import urlencode
+
+# Django libs:
+from django.conf import settings
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+# Functions:
+def encode_cursor(values):
+    """Return opaque URL-safe token for sort key 'values' of a row. Dates keep
+    their microseconds, for the row to compare equal to its cursor.
+    """
+    data = json.dumps(values, default=lambda value: value.isoformat(), separators=(",", ":"))
+
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, model, fields):
+    """Return list of the values of 'fields' of 'model' in 'token' (as returned
+    by encode_cursor()), converted to their Python types, or raise BadRequest
+    if it is not a valid cursor for them.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(data.decode("utf-8"))
+    except (binascii.Error, ValueError):
+        raise BadRequest("Invalid cursor: {}".format(token))
+
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise BadRequest("Invalid cursor: {}".format(token))
+
+    converted = []
+    for field, value in zip(fields, values):
+        model_field = get_field(model, field)
+        try:
+            value = model_field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise BadRequest("Invalid cursor: {}".format(token))
+        if value is None and not model_field.null or isinstance(value, datetime) and timezone.is_naive(value):
+            raise BadRequest("Invalid cursor: {}".format(token))
+        converted.append(value)
+
+    return converted
+
+
+def get_field(model, field):
+    """Return model field of 'model' named 'field' (which may span relations,
+    as "ip__ip_name").
+    """
+    names = field.split("__")
+    for name in names[:-1]:
+        model = model._meta.get_field(name).related_model
+
+    return model._meta.get_field(names[-1])
+
+
+def get_value(obj, field):
+    """Return value of 'field' (which may span relations, as "ip__ip_name") of 'obj'."""
+
+    return functools.reduce(getattr, field.split("__"), obj)
+
+
+def after_q(fields, values, descending, nullable, backwards=False):
+    """Return Q selecting the rows after the one with sort key 'values' (or
+    before it, if 'backwards'), in the order of 'fields' (ascending, or
+    descending if 'descending', NULLs last either way). Fields in 'nullable'
+    may be NULL. The last field must be unique.
+    """
+    op = "lt" if descending != backwards else "gt"
+    q = Q(pk__in=[])  # no rows
+    equal = Q()
+    for field, value in zip(fields, values):
+        if value is None:
+            # Nothing after NULL but more NULLs; everything not NULL is before it:
+            if backwards:
+                q |= equal & Q(**{field + "__isnull": False})
+            equal &= Q(**{field + "__isnull": True})
+        else:
+            step = Q(**{"{}__{}".format(field, op): value})
+            if field in nullable and not backwards:
+                step |= Q(**{field + "__isnull": True})
+            q |= equal & step
+            equal &= Q(**{field: value})
+
+    return q
+
+
+def get_ordering(fields, descending, nullable, backwards=False):
+    """Return order_by() arguments to sort by 'fields', as in after_q(), or
+    in reverse, if 'backwards'.
+    """
+    ordering = []
+    for field in fields:
+        expression = F(field).asc if descending == backwards else F(field).desc
+        if field in nullable:
+            ordering.append(expression(**{"nulls_first" if backwards else "nulls_last": True}))
+        else:
+            ordering.append(expression())
+
+    return ordering
+
+
+def get_page(queryset, fields, descending=False, nullable=(), after=None, before=None, size=None):
+    """Return the Page of 'queryset' sorted by 'fields' (see after_q()) that
+    comes right after cursor 'after', or right before cursor 'before', or
+    the first one. Whatever the page, it takes a single query, of at most
+    'size' (default: settings.PROJECT_PAGE_SIZE) + 1 rows.
+    """
+    size = size or settings.PROJECT_PAGE_SIZE
+    backwards = before is not None
+    cursor = before if backwards else after
+    if cursor is not None:
+        values = decode_cursor(cursor, queryset.model, fields)
+        queryset = queryset.filter(after_q(fields, values, descending, nullable, backwards))
+
+    rows = list(queryset.order_by(*get_ordering(fields, descending, nullable, backwards))[:size + 1])
+    more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+
+    return Page(rows, fields,
+                has_previous=more if backwards else after is not None,
+                has_next=backwards or more)
+
+
+# Classes:
+class Page(object):
+    """Page of rows of a keyset pagination, with cursors to the pages around it."""
+
+    def __init__(self, rows, fields, has_previous, has_next):
+        self.rows = rows
+        self.fields = fields
+        self.has_previous = has_previous and bool(rows)
+        self.has_next = has_next and bool(rows)
+
+    def cursor(self, row):
+        """Return cursor of 'row'."""
+
+        return encode_cursor([get_value(row, field) for field in self.fields])
+
+    def query(self, params, direction):
+        """Return query string with GET 'params' plus the cursor of the
+        previous or next page ('direction' either "before" or "after").
+        """
+        row = self.rows[0] if direction == "before" else self.rows[-1]
+        params = dict(params, **{direction: self.cursor(row)})
+
+        return "?" + urlencode(params)
+
+    def previous_query(self, params):
+        """Return query string of the previous page, or None if first."""
+
+        return self.query(params, "before") if self.has_previous else None
+
+    def next_query(self, params):
+        """Return query string of the next page, or None if last."""
+
+        return self.query(params, "after") if self.has_next else None
@@ -0,0 +1,177 @@
+# Standard libs:
+from datetime import timezone as dt_timezone
+from dateutil.relativedelta import relativedelta as rdelta
+
+# Django libs:
+from django.conf import settings
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+
+
+# Constants:
+# Months after expiring that Projects are moved to IHBuffer, and deleted (see Project):
+MOVED_AFTER = {"expired": 6, "frozen": 18}
+PK_PLACEHOLDER = 2**31 - 1  # pk used to reverse URLs once per page
+
+
+# Functions:
+def render_list(request, template_name, context, mk_rows):
+    """Render list page 'template_name' with 'context', with the engine in
+    settings.LIST_TEMPLATE_ENGINE. The Jinja2 templates get, as 'rows', the
+    list of dicts returned by 'mk_rows(context)', with every cell already
+    computed, instead of calling model methods in the template.
+    """
+    engine = settings.LIST_TEMPLATE_ENGINE
+    if engine == "jinja2":
+        context = dict(context, rows=mk_rows(context))
+
+    return render(request, template_name, context, using=engine)
+
+
+def prefetch_periods(queryset):
+    """Return 'queryset' of Projects prefetching their Periods, which the Django
+    templates read (through model methods), but not the rows for Jinja2.
+    """
+    if settings.LIST_TEMPLATE_ENGINE == "jinja2":
+        return queryset
+
+    return queryset.prefetch_related("period_set")
+
+
+def stripes(rows):
+    """Set "css" class of 'rows' to "finished" for finished Projects, and
+    alternately "row1" and "row2" for the rest, as {% cycle %} did.
+    """
+    n = 0
+    for row in rows:
+        if row.get("finished"):
+            row["css"] = "finished"
+        else:
+            row["css"] = "row{}".format(n % 2 + 1)
+            n += 1
+
+    return rows
+
+
+def url_maker(name):
+    """Return function returning the URL of view 'name' for a given pk. The
+    URL is reversed only once, instead of once per row.
+    """
+    template = reverse(name, args=[PK_PLACEHOLDER]).replace(str(PK_PLACEHOLDER), "{}")
+
+    return template.format
+
+
+def date_str(value):
+    """Return 'value' as YYYY-MM-DD in UTC, as Project.get_end_str() and friends
+    (but "" for None, as the |date filter).
+    """
+    if value is None:
+        return ""
+
+    return value.astimezone(dt_timezone.utc).strftime("%Y-%m-%d")
+
+
+def ip_rows(context):
+    """Rows of projects/index.html: IPs, with their open Projects if shown."""
+
+    now = context["now"]
+    ip_url, project_url = url_maker("projects:ip_detail"), url_maker("projects:detail")
+    rows = []
+    for ip in context["ip_list"]:
+        rows.append({
+            "url": ip_url(ip.id),
+            "name": ip.ip_name,
+            "n_open": ip.n_open,
+            "quota_open": ip.quota_open,
+            "projects": [{
+                "url": project_url(p.id),
+                "name": p.name,
+                "quota": p.current_quota,
+                "expired": int(p.end is not None and p.end < now),
+            } for p in getattr(ip, "open_projects", [])],
+        })
+
+    return stripes(rows)
+
+
+def project_rows(context):
+    """Rows of projects/project_index.html, out of the Projects' summary columns."""
+
+    now = context["now"]
+    ip_url, project_url = url_maker("projects:ip_detail"), url_maker("projects:detail")
+    rows = []
+    for p in context["project_list"]:
+        rows.append({
+            "url": project_url(p.id),
+            "name": p.name,
+            "proj_id": p.proj_id,
+            "user": p.user,
+            "ip_url": ip_url(p.ip_id),
+            "ip": p.ip.ip_name,
+            "quota": p.current_quota,
+            "start": date_str(p.start),
+            "end": date_str(p.end),
+            "finished": p.finished,
+            "expired": int(p.end is not None and p.end < now),
+        })
+
+    return stripes(rows)
+
+
+def expired_project_rows(context):
+    """Rows of projects/project_index_expired.html and project_index_frozen.html,
+    out of the Projects' summary columns (no Periods read), with the date of
+    moving to IHBuffer or of deletion, respectively, as "moved".
+    """
+    now = context["now"]
+    months = MOVED_AFTER[context["status"]]
+    ip_url, project_url = url_maker("projects:ip_detail"), url_maker("projects:detail")
+    rows = []
+    for p in context["project_list"]:
+        expired = p.end < now
+        rows.append({
+            "url": project_url(p.id),
+            "name": p.name,
+            "proj_id": p.proj_id,
+            "user": p.user,
+            "ip_url": ip_url(p.ip_id),
+            "ip": p.ip.ip_name,
+            "start": date_str(p.start),
+            "end": date_str(p.end),
+            "finished": p.finished,
+            "expired": int(expired),
+            "moved": date_str(p.end + rdelta(months=months)),
+            "days_expired": (now - p.end).days if expired else 0,
+        })
+
+    return stripes(rows)
+
+
+def ip_project_rows(context):
+    """Rows of projects/ip_detail.html: all Projects of the IP, with their status."""
+
+    now = timezone.now()
+    project_url = url_maker("projects:detail")
+    rows = []
+    for p in context["ip"].project_set.all():
+        if p.finished:
+            status = "Terminado"
+        elif p.in_buffer:
+            status = "Congelado"
+        elif p.end is not None and p.end < now:
+            status = "Expirado"
+        else:
+            status = "Activo"
+        rows.append({
+            "url": project_url(p.id),
+            "name": p.name,
+            "proj_id": p.proj_id,
+            "user": p.user,
+            "start": date_str(p.start),
+            "end": date_str(p.end),
+            "status": status,
+        })
+
+    return rows
@@ -5,7 +5,7 @@ Chart.defaults.global.animation.duration = 500;
 
 $(document).ready(function() {
     var dataUrl = $('#data-url').attr("data-name");
-    $.get(dataUrl, function(data) {
+    $.get(dataUrl, {points: ctx.canvas.width}, function(data) {
         dataset = {
             label: data.label,
             borderColor: data.borderColor,
@@ -0,0 +1,150 @@
+# Django libs:
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Standard libs:
+import random
+from datetime import timedelta
+
+# Our libs:
+from projects import cache
+from projects.models import normalize_name, name_trigrams
+from projects.models import IP, IPTrigram, Project, Period, LedgerMonth, LedgerEntry, Reservation
+
+# Constants:
+FIRST_NAMES = ["Ana", "Iñaki", "Jon", "María", "Ane", "Mikel", "Lucía", "Peio", "Nerea", "Ángel", "Irene", "Unai"]
+LAST_NAMES = ["Silanes", "García", "Etxeberria", "López", "Agirre", "Martínez", "Zubiri", "Pérez", "Ibarra", "Núñez"]
+WORDS = ["ab initio", "dynamics", "catalysis", "proteins", "graphene", "turbulence", "DFT", "plasmonics",
+         "clusters", "spin", "membranes", "Monte Carlo", "surfaces", "solvation", "phonons", "QM/MM"]
+
+# Fate of each project, with its probability weight. Each fate is given by
+# how its last active period ended (days from now) and its final status:
+FATES = {
+    "active": 50,    # still running
+    "expired": 15,   # ended recently, still in cluster
+    "frozen": 10,    # moved to IHBuffer
+    "finished": 25,  # deleted long ago
+}
+PERIOD_LENGTHS = [90, 180, 365, 365, 730]  # days of each active period (renewal)
+GAP_PROBABILITY = 0.15  # probability of an (expired) gap between renewals
+QUOTA_CHANGE_PROBABILITY = 0.4  # probability that a renewal changes the quota
+BATCH_SIZE = 500  # rows per INSERT
+
+
+# Functions:
+def mk_period_history(rng, project, now, fate):
+    """Return list of unsaved Periods of 'project', ending as 'fate' says,
+    with renewals, quota changes and gaps.
+    """
+    if fate == "active":
+        end = now + timedelta(days=rng.uniform(1, 365))
+    elif fate == "expired":
+        end = now - timedelta(days=rng.uniform(1, 180))
+    elif fate == "frozen":
+        end = now - timedelta(days=rng.uniform(180, 540))
+    else:
+        end = now - timedelta(days=rng.uniform(540, 1500))
+
+    # Active periods, backwards from the end:
+    active = []
+    quota = rng.choice([50, 100, 200, 500, 1000, 2000, 5000])
+    for i in range(rng.randint(1, 6)):
+        start = end - timedelta(days=rng.choice(PERIOD_LENGTHS))
+        active.append(Period(proj=project, start=start, end=end, quota=quota, status="active"))
+        if rng.random() < QUOTA_CHANGE_PROBABILITY:
+            quota = max(10, round(quota * rng.choice([0.5, 0.8, 1.25, 2, 3])))
+        end = start
+        if rng.random() < GAP_PROBABILITY:
+            end -= timedelta(days=rng.uniform(10, 120))
+    periods = active[::-1]
+
+    # What came after the last active period:
+    last = periods[-1]
+    if fate == "expired" and rng.random() < 0.5:
+        periods.append(Period(proj=project, start=last.end, end=now, quota=last.quota, status="expired"))
+    elif fate in ["frozen", "finished"]:
+        buffer_start = last.end + timedelta(days=182)
+        periods.append(Period(proj=project, start=last.end, end=buffer_start, quota=last.quota, status="expired"))
+        periods.append(Period(proj=project, start=buffer_start, end=buffer_start + timedelta(days=365),
+                              quota=last.quota, status="frozen"))
+
+    return periods
+
+
+@transaction.atomic
+def clear():
+    """Delete all IPs, Projects (with everything hanging from them) and
+    Reservations. Rows are deleted in bulk, table by table, as deleting them
+    through the ORM would run the Period signal handlers once per row.
+    """
+    with connection.cursor() as cursor:
+        for model in [LedgerEntry, LedgerMonth, Period, Project, IPTrigram, IP, Reservation]:
+            cursor.execute("DELETE FROM {}".format(connection.ops.quote_name(model._meta.db_table)))
+    cache.bump_data_version()
+
+
+@transaction.atomic
+def generate(n_ips, n_projects, n_reservations, seed=0, now=None):
+    """Create 'n_ips' IPs, 'n_projects' Projects (with their Period histories)
+    and 'n_reservations' Reservations, with random (but, given 'seed',
+    reproducible) data. Projects are unevenly spread among IPs, as in real
+    life ('n_ips' must be at least 1 if there are projects). Return dict
+    with amount of objects created, by model name.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+
+    # IPs (and their trigrams, as bulk_create() skips signals):
+    ips = []
+    for i in range(n_ips):
+        name = "{} {} {}".format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), i)
+        ips.append(IP(ip_name=name))
+    ips = IP.objects.bulk_create(ips, batch_size=BATCH_SIZE)
+    trigrams = []
+    for ip in ips:
+        trigrams.extend([IPTrigram(ip=ip, trigram=t) for t in sorted(name_trigrams(normalize_name(ip.ip_name)))])
+    IPTrigram.objects.bulk_create(trigrams, batch_size=BATCH_SIZE)
+
+    # Projects:
+    fates = rng.choices(list(FATES), weights=list(FATES.values()), k=n_projects)
+    owners = rng.choices(range(n_ips), weights=[1.0/(j + 1) for j in range(n_ips)], k=n_projects)
+    projects = []
+    for i, (fate, j) in enumerate(zip(fates, owners)):
+        projects.append(Project(
+            ip=ips[j],
+            name="{} of {}".format(rng.choice(WORDS).capitalize(), rng.choice(WORDS)),
+            user="u{:06d}".format(i),
+            proj_id="SY{:04d}/{:03d}".format(j, i % 1000),
+            cpuh=round(rng.uniform(0, 2e6)),
+            finished=fate == "finished",
+            in_buffer=fate == "frozen",
+        ))
+    projects = Project.objects.bulk_create(projects, batch_size=BATCH_SIZE)
+
+    # Periods:
+    periods = []
+    for project, fate in zip(projects, fates):
+        periods.extend(mk_period_history(rng, project, now, fate))
+    Period.objects.bulk_create(periods, batch_size=BATCH_SIZE)
+
+    # Reservations, from 3 years ago to a year from now:
+    reservations = []
+    for i in range(n_reservations):
+        start = now + timedelta(days=rng.uniform(-3*365, 365))
+        end = start + timedelta(days=rng.uniform(1, 30))
+        reservations.append(Reservation(name="reservation {}".format(i), start=start, end=end,
+                                        nodes=rng.choice([1, 2, 4, 8, 16, 32, 64])))
+    Reservation.objects.bulk_create(reservations, batch_size=BATCH_SIZE)
+
+    # What signals would have done:
+    if projects:
+        new_projects = Project.objects.filter(pk__gte=projects[0].pk, pk__lte=projects[-1].pk)
+        new_projects.update_summaries(batch_size=BATCH_SIZE)
+        LedgerMonth.invalidate(min([p.start for p in periods]), max([p.end for p in periods]))
+
+    return {
+        "IP": len(ips),
+        "Project": len(projects),
+        "Period": len(periods),
+        "Reservation": len(reservations),
+    }
@@ -14,6 +14,7 @@ register_converter(converters.GeneralName, 'ip_name')
 register_converter(converters.GeneralName, 'acc_name')
 register_converter(converters.DateStamp, 'tstamp')
 register_converter(converters.NameWithSpaces, 'sname')
+register_converter(converters.YearMonth, 'yyyymm')
 
 
 # URL patterns:
@@ -33,14 +34,22 @@ urlpatterns = [
     # Info:
     path('readme', views.readme, name='readme'),
     path('reservations', views.reservations, name='reservations'),
+    path('slow_queries', views.slow_queries, name='slow_queries'),
 
     # Data:
     path('disk_accounting/<int:year>/<int:month>', views.disk_accounting, name='disk_accounting'),
+    path('disk_accounting_range/<yyyymm:start>/<yyyymm:end>', views.disk_accounting_range,
+         name='disk_accounting_range'),
+    path('disk_accounting_export/<yyyymm:start>/<yyyymm:end>/<slug:fmt>', views.disk_accounting_export,
+         name='disk_accounting_export'),
     path('account_exists/<acc_name:account>', views.account_exists, name='account_exists'),
+    path('accounts_exist', views.accounts_exist, name='accounts_exist'),
     path('ip_exists/<ip_name:name>', views.ip_exists, name='ip_exists'),
+    path('ips_exist', views.ips_exist, name='ips_exist'),
     path('reservation_plot_data', views.reservation_plot_data, name='reservation_plot_data'),
 
     # Actions:
     path('create_account/<slug:token>/<sname:ip>/<tstamp:end>/<sname:title>/<acc_name:account>/<slug:id>/<int:quota>',
          views.create_account, name='create_account'),
+    path('create_accounts/<slug:token>', views.create_accounts, name='create_accounts'),
 ]
@@ -1,88 +1,136 @@
 # Standard libs:
+import csv
+import json
 import pytz
+import itertools
 from datetime import datetime, timedelta
 
 # Django libs:
 from django.utils import timezone
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import BadRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Prefetch, Sum
 
 # Our libs:
-from WebProjects import settings
-from projects.models import Project, IP, Reservation, Period
+from WebProjects import settings, slowlog
+from projects import accounting, pagination, rows
+from projects.budget import query_budget
+from projects.cache import cache_view, data_condition, get_data_version
+from projects.models import Project, IP, Reservation, Period, LedgerMonth, normalize_name
+
+
+# Constants:
+RESERVATION_PLOT_POINTS = 500  # default max amount of points in reservation plot
+RESERVATION_PLOT_MAX_POINTS = 5000
+IP_CACHE_SIZE = 10000  # max amount of IP name resolutions cached in-process
+ACCOUNTS_PER_QUERY = 900  # max amount of account names checked in a single query
+MAX_ACCOUNTING_MONTHS = 120  # max amount of months of a disk accounting range
+
+# Sort options of the project lists, as the fields to sort by (the last one unique),
+# and the default one of each list ("-" for descending):
+PROJECT_SORTS = {
+    "id": ["id"],
+    "quota": ["current_quota", "id"],
+    "end": ["end", "id"],
+    "ip": ["ip__ip_name", "ip_id", "id"],
+}
+PROJECT_NULLABLE = ["end"]
+PROJECT_SORT_LABELS = {"id": "ID", "quota": "cuota", "end": "fecha fin", "ip": "IP"}
+DEFAULT_PROJECT_SORT = {"open": "id", "all": "id", "expired": "end", "frozen": "end"}
+
+
+# In-process cache of IP name resolutions, for a given data version:
+_ip_cache = {"version": None, "ip_of": {}}
 
 
 # Indices:
+@query_budget(2)
+@cache_view
 def index(request, show_projs="noshow"):
-    project_list = Project.objects.filter(finished=False).order_by('id')
-    ip_list = set([x.ip for x in project_list])
+    # IPs with open projects, with their aggregates, sorted by quota:
+    ip_list = IP.objects.with_project_summary().filter(n_open__gt=0)
+    ip_list = ip_list.order_by("-quota_open", "-quota_total", "-ip_name")
 
-    # Sort ip_list by quota:
-    dsu = []
-    for ip in ip_list:
-        dsu.append([ip.get_quota_raw(), ip.ip_name, ip])
-    dsu.sort()
-    dsu.reverse()
+    if show_projs == "show":
+        open_projects = Project.objects.filter(finished=False).order_by("id")
+        ip_list = ip_list.prefetch_related(Prefetch("project_set", queryset=open_projects, to_attr="open_projects"))
 
-    ip_list = [z for x, y, z in dsu]
+    ip_list = list(ip_list)
+    nprojs = sum([ip.n_open for ip in ip_list])
+    tot_quota = '{0:.2f}'.format(sum([ip.quota_open for ip in ip_list])/1000.0)
 
-    quotas = [x.get_quota() for x in project_list]
-    tot_quota = '{0:.2f}'.format(sum(quotas)/1000.0)
-    
     context = {
-        'project_list': project_list,
-        'nprojs': len(project_list),
+        'nprojs': nprojs,
         'nips': len(ip_list),
         'tot_quota': tot_quota,
         'ip_list': ip_list,
         'show': show_projs,
+        'now': timezone.now(),
     }
     
-    return render(request, 'projects/index.html', context)
+    return rows.render_list(request, 'projects/index.html', context, rows.ip_rows)
 
 
+@query_budget(3)
+@cache_view
 def project_index(request, status="open"):
-    """Show a list of project in diferent states."""
+    """Show a list of project in diferent states, a page at a time. The 'sort'
+    GET parameter picks the order (one of PROJECT_SORTS, with "-" prefix for
+    descending), and the 'after' or 'before' cursors the page.
+    """
+    projects = Project.objects.select_related("ip")
+    now = timezone.now()
 
     if status == 'expired':
-        # Order expired projects by expiration date, not ID:
-        dsu = [(p.how_long_ago_expired, p) for p in Project.objects.filter(finished=False, in_buffer=False) if p.is_expired]
-        dsu = sorted(dsu, reverse=True)
-        project_list = [y for x,y in dsu]
+        project_list = rows.prefetch_periods(projects.filter(finished=False, in_buffer=False, end__lt=now))
     elif status == 'frozen':
-        dsu = []
-        for p in Project.objects.order_by('id'):
-            if p.in_buffer:
-                dsu.append([p.how_long_ago_expired, p])
-        dsu.sort()
-        dsu.reverse()
-        project_list = [y for x, y in dsu]
+        project_list = rows.prefetch_periods(projects.filter(in_buffer=True))
     elif status == 'all':
-        project_list = Project.objects.order_by('id')
+        project_list = projects
     else:  # abiertos
-        project_list = Project.objects.filter(finished=False).filter(in_buffer=False).order_by("id")
+        status = 'open'
+        project_list = projects.filter(finished=False, in_buffer=False)
+
+    # Expired projects are sorted by expiration date (end of latest active period) by default:
+    sort = request.GET.get("sort", DEFAULT_PROJECT_SORT[status])
+    if sort.lstrip("-") not in PROJECT_SORTS:
+        raise BadRequest("Unknown sort: {}".format(sort))
+    page = pagination.get_page(project_list, PROJECT_SORTS[sort.lstrip("-")], sort.startswith("-"),
+                               PROJECT_NULLABLE, request.GET.get("after"), request.GET.get("before"))
+
+    summary = project_list.aggregate(nprojs=Count("id"), nips=Count("ip", distinct=True), quota=Sum("current_quota"))
+    tot_quota = '{0:.2f}'.format((summary["quota"] or 0)/1000.0)
 
-    ips = set([x.ip.ip_name for x in project_list])
-    quotas = [x.get_quota() for x in project_list]
-    tot_quota = '{0:.2f}'.format(sum(quotas)/1000.0)
-    
     context = {
-        'project_list': project_list,
-        'nprojs': len(project_list),
-        'nips': len(ips),
+        'project_list': page.rows,
+        'previous_page': page.previous_query({"sort": sort}),
+        'next_page': page.next_query({"sort": sort}),
+        'sorts': [(label, "-" + key if sort == key else key, sort.lstrip("-") == key)
+                  for key, label in PROJECT_SORT_LABELS.items()],
+        'sort': sort,
+        'nprojs': summary["nprojs"],
+        'nips': summary["nips"],
         'tot_quota': tot_quota,
         'status': status,
+        'now': now,
     }
 
     if status == 'expired':
-        return render(request, 'projects/project_index_expired.html', context)
+        return rows.render_list(request, 'projects/project_index_expired.html', context, rows.expired_project_rows)
     elif status == 'frozen':
-        return render(request, 'projects/project_index_frozen.html', context)
+        return rows.render_list(request, 'projects/project_index_frozen.html', context, rows.expired_project_rows)
     else:
-        return render(request, 'projects/project_index.html', context)
+        return rows.render_list(request, 'projects/project_index.html', context, rows.project_rows)
 
 
 # Details:
+@query_budget(3)
+@cache_view
 def detail(request, project_id=None):
     prj = Project.objects.get(pk=project_id)
 
@@ -93,23 +141,43 @@ def detail(request, project_id=None):
     return render(request, 'projects/detail.html', context)
 
 
+@query_budget(3)
+@cache_view
 def ip_detail(request, ip_id=None):
-    ip = IP.objects.get(pk=ip_id)
+    projects = Project.objects.order_by("id").prefetch_related("period_set")
+    ip = IP.objects.prefetch_related(Prefetch("project_set", queryset=projects)).get(pk=ip_id)
 
     context = {
         'ip': ip,
     }
 
-    return render(request, 'projects/ip_detail.html', context)
+    return rows.render_list(request, 'projects/ip_detail.html', context, rows.ip_project_rows)
  
 
 # Info:
+@query_budget(0)
 def readme(request):
     context = {}
 
     return render(request, 'projects/README', context)
 
 
+@query_budget(2)
+@staff_member_required
+def slow_queries(request):
+    """Show slow queries logged (see WebProjects/slowlog.py), aggregated by
+    normalized statement. Only for staff.
+    """
+    context = {
+        'summary': slowlog.get_summary(),
+        'threshold': settings.SLOW_QUERY_THRESHOLD,
+    }
+
+    return render(request, 'projects/slow_queries.html', context)
+
+
+@query_budget(1)
+@cache_view
 def reservations(request):
     """Show view for Reservations."""
 
@@ -125,8 +193,14 @@ def reservations(request):
 
 
 # Data:
+@query_budget(2)
+@data_condition()
+@cache_view
 def disk_accounting(request, year, month):
-    """Return JSON with disk accounting data."""
+    """Return JSON with disk accounting data of given month: a record per
+    Project with Periods overlapping it, with its pk, id, ip, name, account
+    and disk_cost.
+    """
 
     # Base data:
     year = int(year)
@@ -140,33 +214,138 @@ def disk_accounting(request, year, month):
     else:
         end = timezone.datetime(year=year, month=month+1, day=1, tzinfo=tz)
 
+    # Closed months are served from the ledger, if there:
+    if end <= timezone.now():
+        ledger_month = LedgerMonth.objects.filter(month=start.date()).first()
+        if ledger_month is not None:
+            entries = ledger_month.ledgerentry_set.select_related("proj__ip").order_by("proj_id")
+            entries = entries.only("month", "disk_cost", "proj__proj_id", "proj__name", "proj__user", "proj__ip__ip_name")
+            data = {
+                "year": year,
+                "month": month,
+                "projects": [{
+                    "pk": e.proj_id,
+                    "id": e.proj.proj_id,
+                    "ip": e.proj.ip.ip_name,
+                    "name": e.proj.name,
+                    "account": e.proj.user,
+                    "disk_cost": e.disk_cost,
+                } for e in entries],
+            }
+
+            return JsonResponse(data)
+
     # Filter Periods overlapping with requested period, and gather data:
-    disk_cost_of, ip_of, name_of, id_of, account_of = {}, {}, {}, {}, {}
-    for period in Period.objects.filter(end__gt=start, start__lt=end):
-        k = period.proj.pk
-        disk_cost_of[k] = disk_cost_of.get(k, 0.0) + period.disk_cost(start, end)
-        id_of[k] = period.proj.proj_id
-        ip_of[k] = period.proj.ip.ip_name
-        name_of[k] = period.proj.name
-        account_of[k] = period.proj.user
+    periods = Period.objects.filter(end__gt=start, start__lt=end).select_related("proj__ip")
+    periods = periods.only("start", "end", "quota", "status",
+                           "proj__proj_id", "proj__name", "proj__user", "proj__ip__ip_name")
+
+    record_of = {}
+    for period in periods:
+        k = period.proj_id
+        if k not in record_of:
+            record_of[k] = {
+                "pk": k,
+                "id": period.proj.proj_id,
+                "ip": period.proj.ip.ip_name,
+                "name": period.proj.name,
+                "account": period.proj.user,
+                "disk_cost": 0.0,
+            }
+        record_of[k]["disk_cost"] += period.disk_cost(start, end)
 
     # Encapsulate data to return:
     data = {
-        "disk_cost_of": disk_cost_of,
-        "ip_of": ip_of,
-        "name_of": name_of,
-        "id_of": id_of,
-        "account_of": account_of,
+        "year": year,
+        "month": month,
+        "projects": [record_of[k] for k in sorted(record_of)],
     }
 
     return JsonResponse(data)
 
 
+@query_budget(2)
+@data_condition()
+@cache_view
+def disk_accounting_range(request, start, end):
+    """Return JSON with disk accounting data of each month from 'start' to
+    'end' (both in YYYYMM format, both included): the list of months, and a
+    record per Project, with its pk, id, ip, name, account, and disk_cost as
+    a list with the cost for each month.
+    """
+    try:
+        edges = accounting_edges(start, end)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    pks, cost, gbd = accounting.disk_cost_matrix(edges)
+
+    projects = Project.objects.filter(pk__in=pks.tolist()).select_related("ip")
+    projects = projects.only("proj_id", "name", "user", "ip__ip_name").in_bulk()
+
+    records = []
+    for pk, row in zip(pks.tolist(), cost.tolist()):
+        p = projects[pk]
+        records.append({
+            "pk": pk,
+            "id": p.proj_id,
+            "ip": p.ip.ip_name,
+            "name": p.name,
+            "account": p.user,
+            "disk_cost": row,
+        })
+
+    data = {
+        "months": [e.strftime("%Y-%m") for e in edges[:-1]],
+        "projects": records,
+    }
+
+    return JsonResponse(data)
+
+
+def disk_accounting_export(request, start, end, fmt):
+    """Stream disk accounting data of each month from 'start' to 'end' (both
+    in YYYYMM format, both included), as CSV or newline-delimited JSON
+    ('fmt' either 'csv' or 'ndjson'), one line per Project and month.
+    """
+    if fmt not in ["csv", "ndjson"]:
+        raise Http404("Unknown format: {}".format(fmt))
+
+    try:
+        edges = accounting_edges(start, end)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    entries = accounting.iter_accounting(edges)
+
+    if fmt == "csv":
+        writer = csv.DictWriter(Echo(), fieldnames=accounting.EXPORT_FIELDS)
+        lines = itertools.chain([writer.writeheader()], (writer.writerow(entry) for entry in entries))
+        content_type = "text/csv"
+    else:
+        lines = (json.dumps(entry) + "\n" for entry in entries)
+        content_type = "application/x-ndjson"
+
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = 'attachment; filename="disk_accounting_{}_{}.{}"'.format(start, end, fmt)
+
+    return response
+
+
+@query_budget(1)
+@data_condition(time_dependent=True)
+@cache_view(time_dependent=True)
 def reservation_plot_data(request):
-    """Return JSON with reservation data to be plotted."""
+    """Return JSON with reservation data to be plotted. The window and the
+    resolution can be given with the optional 'from' and 'to' (YYYYMMDDHHmm)
+    and 'points' GET parameters.
+    """
+    try:
+        start, end = [parse_datestamp(request.GET[k]) if k in request.GET else None for k in ["from", "to"]]
+        points = min(int(request.GET.get("points", RESERVATION_PLOT_POINTS)), RESERVATION_PLOT_MAX_POINTS)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
     data = {
-        "data": get_reservation_plot_data(),
+        "data": get_reservation_plot_data(start, end, max(points, 2)),
         "borderColor": "rgba(50, 50, 255, 1.0)",
         "backgroundColor": "rgba(100, 100, 255, 0.5)",
         "label": "Nodos reservados",
@@ -175,22 +354,47 @@ def reservation_plot_data(request):
     return JsonResponse(data)
 
 
+@query_budget(1)
+@data_condition()
+@cache_view
 def account_exists(request, account):
-    """Return whether or not account named 'account' exists."""
+    """Return whether or not account named 'account' exists (in an open Project)."""
 
+    data = {
+        "response": Project.objects.filter(finished=False, user=account).exists(),
+    }
+
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_POST
+def accounts_exist(request):
+    """Return whether or not each account name in the JSON list in the body of
+    the request exists (in an open Project), as a name -> bool map.
+    """
     try:
-        Project.objects.filter(finished=False).get(user=account)
-        exists = True
-    except:
-        exists = False
+        accounts = json.loads(request.body)
+    except ValueError:
+        accounts = None
+    if not isinstance(accounts, list) or not all([isinstance(x, str) for x in accounts]):
+        return JsonResponse({"error": "Body must be a JSON list of account names"}, status=400)
+
+    existing = set()
+    for i in range(0, len(accounts), ACCOUNTS_PER_QUERY):
+        chunk = accounts[i:i+ACCOUNTS_PER_QUERY]
+        existing.update(Project.objects.filter(finished=False, user__in=chunk).values_list("user", flat=True))
 
     data = {
-        "response": exists,
+        "response": dict([(account, account in existing) for account in accounts]),
     }
 
     return JsonResponse(data)
 
 
+@query_budget(2)
+@data_condition()
+@cache_view
 def ip_exists(request, name):
     """Use 'name' name fragment to find a single IP (investigador principal)
     with that name. Return a single IP object. Anything else returns None.
@@ -206,7 +410,29 @@ def ip_exists(request, name):
     return JsonResponse(data)
 
 
+@query_budget(2)
+@csrf_exempt
+@require_POST
+def ips_exist(request):
+    """Return whether or not a single IP exists for each name fragment in the
+    JSON list in the body of the request, as a name -> bool map.
+    """
+    try:
+        names = json.loads(request.body)
+    except ValueError:
+        names = None
+    if not isinstance(names, list) or not all([isinstance(x, str) for x in names]):
+        return JsonResponse({"error": "Body must be a JSON list of names"}, status=400)
+
+    data = {
+        "response": dict([(name, ip is not None) for name, ip in resolve_ips(names).items()]),
+    }
+
+    return JsonResponse(data)
+
+
 # Actions:
+@query_budget(7)
 def create_account(request, token, ip, end, title, account, id, quota):
     """Create account."""
 
@@ -220,8 +446,7 @@ def create_account(request, token, ip, end, title, account, id, quota):
     # Starting and ending dates:
     tz = pytz.timezone("Europe/Madrid")
     start_date = datetime.now(tz)
-    end_date = datetime.strptime(end, "%Y%m%d%H%M")
-    end_date = timezone.make_aware(end_date, timezone=tz)
+    end_date = parse_datestamp(end, tz)
 
     # Create Project object:
     project = Project(ip=proj_ip,
@@ -242,56 +467,232 @@ def create_account(request, token, ip, end, title, account, id, quota):
     return JsonResponse({"response": True})
 
 
+@csrf_exempt
+@require_POST
+def create_accounts(request, token):
+    """Create several accounts at once, from a JSON list in the body of the
+    request. Each element is a dict with the same data create_account() takes
+    in its URL: "ip", "end" (YYYYMMDDHHmm), "title", "account", "id" and
+    "quota". All of them are created in a single transaction. Return a list
+    with the result of each element: {"response": True, "pk": pk} if created,
+    {"response": False, "error": reason} otherwise.
+    """
+    # Poor-man's authentication:
+    if token != settings.J["ACTION_TOKEN"]:
+        return JsonResponse({})
+
+    try:
+        items = json.loads(request.body)
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        return JsonResponse({"error": "Body must be a JSON list of accounts"}, status=400)
+
+    # Validate each item on its own:
+    cleaned = []
+    for item in items:
+        try:
+            cleaned.append(clean_account(item))
+        except ValueError as e:
+            cleaned.append(e)
+
+    # Get the IP of each project, once per name:
+    ip_of = resolve_ips([x["ip"] for x in cleaned if isinstance(x, dict)])
+
+    # Starting and ending dates:
+    tz = pytz.timezone("Europe/Madrid")
+    start_date = datetime.now(tz)
+
+    # Build Project and Period objects:
+    results, projects, periods = [], [], []
+    for item in cleaned:
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            proj_ip = ip_of[item["ip"]]
+            if proj_ip is None:
+                raise ValueError("No single IP matches '{}'".format(item["ip"]))
+            end_date = parse_datestamp(item["end"], tz)
+            quota = item["quota"]
+            project = Project(ip=proj_ip, name=item["title"], user=item["account"], proj_id=item["id"])
+        except ValueError as e:
+            results.append({"response": False, "error": "{}: {}".format(type(e).__name__, e)})
+            continue
+
+        results.append({"response": True})
+        projects.append(project)
+        periods.append(Period(start=start_date, end=end_date, quota=quota, status="active"))
+
+    with transaction.atomic():
+        Project.objects.bulk_create(projects)
+        for project, period in zip(projects, periods):
+            period.proj = project
+        Period.objects.bulk_create(periods)
+        Project.objects.filter(pk__in=[p.pk for p in projects]).update_summaries()
+
+    created = iter(projects)
+    for result in results:
+        if result["response"]:
+            result["pk"] = next(created).pk
+
+    return JsonResponse({"response": results})
+
+
+# Utility classes:
+class Echo(object):
+    """File-like object that just returns what is written to it, to have
+    csv.writer produce lines for a StreamingHttpResponse.
+    """
+    def write(self, value):
+        return value
+
+
 # Utility functions:
-def get_reservation_plot_data():
-    """Return data for reservation data plot."""
-    
-    timezone = pytz.timezone("Europe/Madrid")
-    t0 = datetime.now(timezone)
+def get_reservation_plot_data(start=None, end=None, points=RESERVATION_PLOT_POINTS):
+    """Return data for reservation data plot: amount of reserved nodes from
+    'start' (by default, now) to 'end' (by default, end of last reservation),
+    as a step function of at most 'points' points. If there are more changes
+    than that, the window is split into equal bins, and the maximum amount of
+    reserved nodes in each is given.
+    """
+    start = start or timezone.now()
 
-    # Get all "milestones" (reservation starts or ends):
-    milestones = []
-    for res in Reservation.objects.all():
-        if not res.passed:
-            m = (res.start, res.nodes)
-            milestones.append(m)
-            m = (res.end, -res.nodes)
-            milestones.append(m)
-
-    #current_date = sorted(milestones)[0][0]
+    # Only reservations overlapping window:
+    reservations = Reservation.objects.filter(end__gt=start)
+    if end is not None:
+        reservations = reservations.filter(start__lt=end)
+
+    # Get all "milestones" (reservation starts or ends) after start:
     current_nodes = 0
-    X, Y = [], []
-    for t, n in sorted(milestones):
-        pre, post = current_nodes, current_nodes + n
-        current_nodes += n
-
-        # Discard dates before "now":
-        if t < t0:
-            X = [t]
-            Y = [post]
+    milestones = []
+    for res_start, res_end, nodes in reservations.values_list("start", "end", "nodes"):
+        if res_start <= start:
+            current_nodes += nodes
         else:
-            # Pre- and post- bump:
-            X.append(t)
-            X.append(t)
-            Y.append(pre)
-            Y.append(post)
-    
-    X = [t.strftime("%Y-%m-%d %H:%M") for t in X]
+            milestones.append((res_start, nodes))
+        milestones.append((res_end, -nodes))
+    milestones.sort()
+
+    if end is None:
+        end = milestones[-1][0] if milestones else start
+    milestones = [(t, n) for t, n in milestones if t <= end]
+
+    if 2*len(milestones) + 1 > points:
+        # Split window in bins, and keep max value in each:
+        nbins = max(1, points//2)
+        width = (end - start)/nbins
+        X, Y = [], []
+        i = 0
+        for k in range(nbins):
+            bin_start, bin_end = start + k*width, start + (k+1)*width
+            peak = current_nodes
+            while i < len(milestones) and milestones[i][0] < bin_end:
+                current_nodes += milestones[i][1]
+                peak = max(peak, current_nodes)
+                i += 1
+            X.extend([bin_start, bin_end])
+            Y.extend([peak, peak])
+    else:
+        # Pre- and post- bump at each milestone:
+        X, Y = [start], [current_nodes]
+        for t, n in milestones:
+            X.extend([t, t])
+            Y.extend([current_nodes, current_nodes + n])
+            current_nodes += n
+
+    X = [timezone.localtime(t).strftime("%Y-%m-%d %H:%M") for t in X]
 
     data = [{"x": x, "y": y} for x, y in zip(X, Y)]
 
     return data
 
 
-def get_ip(name):
-    """Use 'name' name fragment to find a single IP (investigador principal)
-    with that name. Return a single IP object. Anything else returns None.
+def clean_account(item):
+    """Return dict with the data of an account to create (an element of the
+    body of create_accounts()), checked and normalized as in create_account(),
+    or raise ValueError saying what is wrong with it.
     """
+    if not isinstance(item, dict):
+        raise ValueError("Account must be a JSON object")
+
+    for key, field in [("title", "name"), ("account", "user"), ("id", "proj_id")]:
+        value = item.get(key)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("'{}' must be a non-empty string".format(key))
+        max_length = Project._meta.get_field(field).max_length
+        if len(value) > max_length:
+            raise ValueError("'{}' must be at most {} characters long".format(key, max_length))
+
+    if not isinstance(item.get("ip"), str):
+        raise ValueError("'ip' must be a string")
+
+    end = item.get("end")
+    if isinstance(end, bool) or not isinstance(end, (str, int)):
+        raise ValueError("'end' must be a YYYYMMDDHHmm date")
+
+    quota = item.get("quota")
+    if isinstance(quota, bool) or not isinstance(quota, (str, int, float)):
+        raise ValueError("'quota' must be a number")
     try:
-        ip = IP.objects.get(ip_name__contains=name)
-        return ip
-    except IP.MultipleObjectsReturned:
-        return None
-    except IP.DoesNotExist:
-        return None
+        quota = int(quota)
+    except OverflowError:
+        raise ValueError("'quota' must be a finite number")
+    if quota < 0:
+        raise ValueError("'quota' must not be negative")
+
+    return {
+        "ip": item["ip"],
+        "end": str(end),
+        "title": item["title"],
+        "account": item["account"],
+        "id": item["id"].replace("-", "/"),
+        "quota": quota,
+    }
+
+
+def accounting_edges(start, end):
+    """Return edges (see accounting.month_edges()) of the months from 'start'
+    to 'end' (both in YYYYMM format, both included), or raise ValueError if
+    'end' comes before 'start', or there are more than MAX_ACCOUNTING_MONTHS.
+    """
+    if end < start:
+        raise ValueError("Range ends ({}) before it starts ({})".format(end, start))
+
+    n_months = 12*(int(end[:4]) - int(start[:4])) + int(end[4:]) - int(start[4:]) + 1
+    if n_months > MAX_ACCOUNTING_MONTHS:
+        raise ValueError("Range spans {} months, max is {}".format(n_months, MAX_ACCOUNTING_MONTHS))
+
+    return accounting.month_edges(int(start[:4]), int(start[4:]), int(end[:4]), int(end[4:]))
 
+
+def parse_datestamp(string, tz=None):
+    """Return aware datetime from 'string' in YYYYMMDDHHmm format."""
+
+    return timezone.make_aware(datetime.strptime(string, "%Y%m%d%H%M"), timezone=tz)
+
+
+def resolve_ips(names):
+    """Return dict with the result of get_ip() for each name in 'names'.
+    Names are looked up in an in-process cache (valid while data does not
+    change), and the ones not there are resolved in a single batch.
+    """
+    version = get_data_version()
+    if _ip_cache["version"] != version or len(_ip_cache["ip_of"]) > IP_CACHE_SIZE:
+        _ip_cache["version"] = version
+        _ip_cache["ip_of"] = {}
+    ip_of = _ip_cache["ip_of"]
+
+    missing = [n for n in set(names) if normalize_name(n) not in ip_of]
+    if missing:
+        for name, ip in IP.objects.resolve(missing).items():
+            ip_of[normalize_name(name)] = ip
+
+    return dict([(n, ip_of[normalize_name(n)]) for n in names])
+
+
+def get_ip(name):
+    """Use 'name' name fragment to find a single IP (investigador principal)
+    with that name, ignoring case and accents. Return a single IP object.
+    Anything else returns None.
+    """
+    return resolve_ips([name])[name]